@@ -0,0 +1,265 @@
+import datetime
+import logging
+from typing import List, Optional
+
+from django.conf import settings
+from django.db.models import Q, Case, When
+from django.shortcuts import get_object_or_404
+from ninja import ModelSchema, Router, Schema, UploadedFile, File, Query, FilterSchema, pagination
+from ninja.errors import HttpError
+from pydantic import Field
+
+from employee.models import Department, Employee
+from employee.importer import MAX_BATCH_SIZE, Importer
+from employee.schemas import EmployeeSchema, EmployeeIn, EmployeeOut, ImportOut
+from employee.signals import changes
+from learn_django_ninja.compression import no_compression
+from learn_django_ninja.fieldsets import FieldSet
+from learn_django_ninja.pubsub import event_stream_response
+from learn_django_ninja.validation import fast_validation
+
+logger = logging.getLogger(__name__)
+
+router = Router()
+
+
+@router.post('/employees', response=EmployeeSchema)
+def create_employee(request, payload: EmployeeIn, cv: UploadedFile = File(...)):
+    logger.debug('cv upload: %s (%d bytes)', cv.name, cv.size)
+    employee = Employee(**payload.dict())
+    employee.cv.save(cv.name, cv)
+    return employee
+
+
+@router.get('/employees/{employee_id}', response=EmployeeOut)
+def get_employee(request, employee_id: int):
+    employee = get_object_or_404(Employee, id=employee_id)
+    return employee
+
+
+@router.get('/employees', response=List[EmployeeOut])
+def list_employees(request, fieldset: FieldSet = Query(...)):
+    queryset = Employee.objects.all()
+    if fieldset.is_sparse:
+        return fieldset.response(queryset, EmployeeOut)
+    return queryset
+
+
+@router.put('/employees/{employee_id}')
+@fast_validation()
+def update_employee(request, employee_id: int, payload: EmployeeIn):
+    employee = get_object_or_404(Employee, id=employee_id)
+    for attr, value in payload.dict().items():
+        setattr(employee, attr, value)
+    employee.save()
+    return {'success': True}
+
+
+@router.delete("/employees/{employee_id}")
+def delete_employee(request, employee_id: int):
+    employee = get_object_or_404(Employee, id=employee_id)
+    employee.delete()
+    return {"success": True}
+
+
+@router.post('/import', response=ImportOut)
+def import_employees(request, departments: UploadedFile = File(None), employees: UploadedFile = File(None),
+                     format: str = None, batch_size: int = Query(None, ge=1, le=MAX_BATCH_SIZE)):
+    """
+    批量导入部门和员工（CSV 或 NDJSON），员工的 department 可以引用同一次上传的部门文件里的 key。
+    列的说明见 employee.importer.Importer。
+    """
+    if departments is None and employees is None:
+        raise HttpError(400, 'Upload a departments and/or employees file')
+    files = {kind: (f.file, f.name) for kind, f in (('departments', departments), ('employees', employees)) if f}
+    # 文件级错误（line 为 0）也返回报告：前面的批次可能已经提交，调用方需要知道导入了多少
+    return Importer(batch_size).import_files(files, format).dict()
+
+
+@router.get('/events')
+@no_compression
+async def change_events(request, topics: str = None):
+    """
+    Employee / Department 的变更事件流（SSE），代替轮询列表接口。
+    事件名如 employee.created、department.deleted；?topics=employee,department.updated 只订阅一部分。
+    """
+    topics = [t.strip() for t in topics.split(',') if t.strip()] if topics else None
+    return event_stream_response(request, changes, topics, getattr(settings, 'EVENTS_KEEPALIVE', 15))
+
+
+class EmployeeFilterSchema(FilterSchema):
+    first_name: Optional[str] = Field(q='first_name__icontains')
+    last_name: Optional[str] = Field(q='last_name__icontains')
+    birthdate: Optional[datetime.date]
+
+
+class EmployeeSearchSchema(FilterSchema):
+    # 在一个字段级别的查询是 OR 的关系
+    # 字段级别的查询是 AND 的关系
+    search: Optional[str] = Field(
+        q=['first_name__icontains', 'last_name__icontains'])
+    birthdate: Optional[datetime.date]
+
+
+class EmployeeOrSearchSchema(FilterSchema):
+    search: Optional[str] = Field(
+        q=['first_name__icontains', 'last_name__icontains'],
+        expression_connector='AND'
+    )
+    birthdate: Optional[datetime.date]
+
+    class Config:
+        expression_connector = 'OR'
+
+
+@router.get('/list_employees', response=List[EmployeeSchema])
+def list_filter_employees(request, filters: EmployeeFilterSchema = Query(...)):
+    q = Q(cv__isnull=False) & Q(Case(When(cv='', then=False), default=True))
+    employees = Employee.objects.all()
+    employees = filters.filter(employees)
+    logger.debug('filtered employees: %s', employees)
+    q &= filters.get_filter_expression()
+    logger.debug('filter expression: %s', q)
+    queryset = Employee.objects.filter(q)
+    logger.debug('sql: %s', queryset.query)
+    if logger.isEnabledFor(logging.DEBUG):
+        for qs in queryset:
+            logger.debug('employee %s has empty cv: %s', qs.id, qs.cv == '')
+    return queryset
+
+
+@router.get('/list_search_employees', response=List[EmployeeSchema])
+def list_search_employees(request, filters: EmployeeSearchSchema = Query(...)):
+    employees = Employee.objects.all()
+    employees = filters.filter(employees)
+    return employees
+
+
+@router.get('/list_or_search_employees', response=List[EmployeeSchema])
+def list_or_search_employees(request, filters: EmployeeOrSearchSchema = Query(...)):
+    employees = Employee.objects.all()
+    employees = filters.filter(employees)
+    return employees
+
+
+class EmployeeIgnoreNullSchema(FilterSchema):
+    search: Optional[str] = Field(
+        q=['first_name__icontains', 'last_name__icontains'],
+        expression_connector='OR'
+    )
+    cv: Optional[str] = Field(q='cv__icontains', ignore_one=False)
+
+    class Config:
+        ignore_none = True
+        expression_connector = 'OR'
+
+
+@router.get('list_ignore_null_employees', response=List[EmployeeSchema])
+def list_ignore_null_employees(request, filters: EmployeeIgnoreNullSchema = Query(...)):
+    employees = Employee.objects.all()
+    logger.debug('employees: %s', employees)
+    employees = filters.filter(employees)
+    logger.debug('sql: %s', employees.query)
+    logger.debug('cv only sql: %s', Employee.objects.all().filter(cv__icontains=filters.cv).query)
+    return employees
+
+
+class EmployeeCustomFilterSchema(FilterSchema):
+    search: Optional[str] = Field(
+        q=['first_name__icontains', 'last_name__icontains'],
+        expression_connector='OR'
+    )
+    cv: Optional[str]
+
+    def filter_cv(self, cv: str) -> Q:
+        q = Q()
+        if cv:
+            q = Q(cv__icontains=cv) | Q(
+                Case(When(cv='', then=True), default=False))
+        logger.debug('filter_cv: %s', q)
+        return q
+
+    def custom_expression(self) -> Q:
+        q = super().custom_expression()
+        logger.debug('custom expression: %s', q)
+        return q
+
+
+@router.get('/list_custom_sechma_employees', response=List[EmployeeSchema])
+def list_cstom_scema_employees(request, filters: EmployeeCustomFilterSchema = Query(...)):
+    employees = Employee.objects.all()
+    employees = filters.filter(employees)
+    return employees
+
+
+class DepartmentEmployeeSchema(Schema):
+    id: int
+    title: str
+    employees: List[EmployeeSchema]
+
+
+@router.get("/list_department_with_employees", response=List[DepartmentEmployeeSchema])
+def list_department_with_employees(request, fieldset: FieldSet = Query(...)):
+    if fieldset.is_sparse:
+        return fieldset.response(Department.objects.all(), DepartmentEmployeeSchema)
+    queryset = Department.objects.prefetch_related('employees').all()
+    return queryset
+
+
+class DepartmentModelSchema(ModelSchema):
+    employees: List[EmployeeSchema]
+
+    class Config:
+        model = Department
+        model_fields = '__all__'
+
+
+class EmployeeDepartmentModelSchema(ModelSchema):
+    department: DepartmentModelSchema
+
+    class Config:
+        model = Employee
+        model_fields = '__all__'
+
+
+@router.get('/list_employee_with_department', response=List[EmployeeDepartmentModelSchema])
+def list_employee_with_department(request, fieldset: FieldSet = Query(...)):
+    if fieldset.is_sparse:
+        return fieldset.response(Employee.objects.filter(id__in=(1, 3)), EmployeeDepartmentModelSchema)
+    # queryset = Employee.objects.select_related('department').all()
+    queryset = Employee.objects.filter(
+        id__in=(1, 3)).prefetch_related('department__employees').select_related('department').all()
+    logger.debug('queryset: %s', queryset)
+    logger.debug('sql: %s', queryset.query)
+    return queryset
+
+
+class DepartmentParentSchema(ModelSchema):
+    class Config:
+        model = Department
+        model_fields = '__all__'
+
+
+class DepartmentChildrenSchema(DepartmentParentSchema):
+    children: List[DepartmentParentSchema]
+
+    class Config(DepartmentParentSchema.Config):
+        pass
+
+
+@router.get('/list_department_with_children', response=List[DepartmentChildrenSchema])
+def list_department_with_children(request, fieldset: FieldSet = Query(...)):
+    if fieldset.is_sparse:
+        return fieldset.response(Department.objects.all(), DepartmentChildrenSchema)
+    queryset = Department.objects.prefetch_related('children').all()
+    logger.debug('queryset: %s', queryset)
+    logger.debug('sql: %s', queryset.query)
+    return queryset
+
+
+@router.get("/list_employees_with_page", response=List[EmployeeSchema])
+@pagination.paginate(pagination.PageNumberPagination, pass_parameter='pagination_info')
+def list_employees_with_page(request, **kwargs):
+    page = kwargs['pagination_info'].page
+    logger.debug('page: %s', page)
+    return Employee.objects.all()
@@ -0,0 +1,19 @@
+# Generated by Django 4.2.30 on 2026-10-19 03:22
+
+from django.db import migrations, models
+import employee.models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('employee', '0005_alter_department_parent'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='employee',
+            name='cv',
+            field=models.FileField(blank=True, null=True, storage=employee.models.cv_storage, upload_to='cv'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+import os
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import storages
+from django.db import migrations
+
+from learn_django_ninja.storage import ContentAddressedStorage
+
+
+def move_cv_to_media(apps, schema_editor):
+    """以前没有设置 MEDIA_ROOT，简历存在项目根目录下；复制到按内容寻址的存储里，原文件保留"""
+    Employee = apps.get_model('employee', 'Employee')
+    storage = storages['cv']
+    for employee in Employee.objects.exclude(cv='').exclude(cv__isnull=True).only('id', 'cv').iterator():
+        name = employee.cv.name
+        path = os.path.join(settings.BASE_DIR, name)
+        if ContentAddressedStorage.is_blob_name(name) or not os.path.isfile(path):
+            continue
+        with open(path, 'rb') as f:
+            new_name = storage.save(f'cv/{os.path.basename(name)}', File(f))
+        Employee.objects.filter(id=employee.id).update(cv=new_name)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('employee', '0006_alter_employee_cv'),
+    ]
+
+    operations = [
+        migrations.RunPython(move_cv_to_media, migrations.RunPython.noop),
+    ]
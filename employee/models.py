@@ -1,8 +1,13 @@
+from django.core.files.storage import storages
 from django.db import models
 
 
 # Create your models here.
 
+def cv_storage():
+    return storages['cv']
+
+
 class Department(models.Model):
     title = models.CharField(max_length=100)
     parent = models.ForeignKey(
@@ -18,7 +23,7 @@ class Employee(models.Model):
     department = models.ForeignKey(
         Department, on_delete=models.CASCADE, db_constraint=False, related_name='employees')
     birthdate = models.DateField(null=True, blank=True)
-    cv = models.FileField(null=True, blank=True)
+    cv = models.FileField(null=True, blank=True, upload_to='cv', storage=cv_storage)
 
     class Meta:
         db_table = 'employee'
@@ -1,5 +1,7 @@
 from datetime import date
-from ninja import ModelSchema, Schema
+from typing import Dict, List
+
+from ninja import Field, ModelSchema, Schema
 
 from employee.models import Employee
 
@@ -11,6 +13,13 @@ class EmployeeIn(Schema):
     birthdate: date = None
 
 
+class DepartmentIn(Schema):
+    key: str
+    title: str = Field(..., max_length=100)
+    parent: str = None
+    parent_id: int = None
+
+
 class EmployeeOut(Schema):
     id: int
     first_name: str
@@ -23,3 +32,22 @@ class EmployeeSchema(ModelSchema):
     class Config:
         model = Employee
         model_fields = '__all__'
+
+
+class DepartmentOut(Schema):
+    id: int
+    title: str
+    parent_id: int = None
+
+
+class ImportRowError(Schema):
+    file: str
+    line: int
+    errors: List[dict]
+
+
+class ImportOut(Schema):
+    created: Dict[str, int]
+    failed: Dict[str, int]
+    errors: List[ImportRowError]
+    truncated: bool
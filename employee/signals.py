@@ -0,0 +1,69 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models import DEFERRED
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+
+from employee.models import Department, Employee
+from employee.schemas import DepartmentOut, EmployeeOut
+from learn_django_ninja.pubsub import Broker
+from learn_django_ninja.storage import release
+
+changes = Broker(getattr(settings, 'EVENTS_BUFFER_SIZE', 1000))
+
+SCHEMAS = {
+    Employee: EmployeeOut,
+    Department: DepartmentOut,
+}
+
+
+def publish(sender, instance, action):
+    data = SCHEMAS[sender].from_orm(instance).dict()
+    event = f'{sender._meta.model_name}.{action}'
+    # 事务回滚的修改不应该推送出去
+    transaction.on_commit(lambda: changes.publish(event, data))
+
+
+@receiver(post_save, sender=Employee)
+@receiver(post_save, sender=Department)
+def publish_save(sender, instance, created, raw=False, **kwargs):
+    if not raw:
+        publish(sender, instance, 'created' if created else 'updated')
+
+
+@receiver(post_delete, sender=Employee)
+@receiver(post_delete, sender=Department)
+def publish_delete(sender, instance, **kwargs):
+    publish(sender, instance, 'deleted')
+
+
+# Employee.cv 是按内容寻址存储的，记录被删除或换了简历后，没有其他记录引用的文件要删掉
+def cv_name(instance):
+    """直接读 __dict__：cv 被 defer / only 掉时返回 DEFERRED，不会为每一行触发 refresh_from_db"""
+    value = instance.__dict__.get('cv', DEFERRED)
+    return getattr(value, 'name', value)
+
+
+def cv_storage(sender):
+    return sender._meta.get_field('cv').storage
+
+
+@receiver(post_init, sender=Employee)
+def remember_cv(sender, instance, **kwargs):
+    instance._saved_cv = cv_name(instance)
+
+
+@receiver(post_save, sender=Employee)
+def release_replaced_cv(sender, instance, raw=False, **kwargs):
+    name = cv_name(instance)
+    # 加载时 cv 被 defer 了就不知道原来的文件，留给 gc_blobs 清理
+    if not raw and DEFERRED not in (instance._saved_cv, name) and instance._saved_cv != name:
+        release(cv_storage(sender), instance._saved_cv)
+    instance._saved_cv = name
+
+
+@receiver(post_delete, sender=Employee)
+def release_deleted_cv(sender, instance, **kwargs):
+    name = cv_name(instance)
+    if name is not DEFERRED:
+        release(cv_storage(sender), name)
@@ -1,3 +1,327 @@
-from django.test import TestCase
+import hashlib
+import io
+import os
+import shutil
+import tempfile
+from unittest import mock
 
-# Create your tests here.
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from employee.importer import MAX_BATCH_SIZE, Importer, ImportReport
+from employee.models import Department, Employee
+from employee.schemas import DepartmentIn, EmployeeIn, EmployeeOut
+from employee.signals import changes
+from learn_django_ninja.fieldsets import build_tree, freeze, sparse_schema
+from learn_django_ninja.tests import ValidationParityMixin
+
+
+class EmployeeInParityTest(ValidationParityMixin, SimpleTestCase):
+    model = EmployeeIn
+    cases = [
+        {'first_name': 'a', 'last_name': 'b'},
+        {'first_name': 'a', 'last_name': 'b', 'department_id': '3', 'birthdate': '2000-01-02'},
+        {'first_name': 'a', 'last_name': 'b', 'department_id': None, 'birthdate': None},
+        {'first_name': 1, 'last_name': 'b', 'birthdate': 946771200},
+        {'first_name': 'a'},
+        {'first_name': 'a', 'last_name': 'b', 'department_id': 'x', 'birthdate': '2000-13-01'},
+    ]
+
+
+class DepartmentInParityTest(ValidationParityMixin, SimpleTestCase):
+    model = DepartmentIn
+    cases = [
+        {'key': 'a', 'title': 'A'},
+        {'key': 1, 'title': 'A', 'parent': 'b', 'parent_id': '2'},
+        {'key': 'a', 'title': 'x' * 101},
+        {'title': 'x' * 200, 'parent_id': 'x'},
+    ]
+
+
+def ndjson(*lines):
+    return io.BytesIO('\n'.join(lines).encode())
+
+
+class ImporterTest(TestCase):
+    def errors(self, report):
+        return [(e['file'], e['line'], e['errors'][0]['msg']) for e in report.errors]
+
+    def test_child_before_parent(self):
+        importer = Importer()
+        report = importer.import_departments(io.BytesIO(
+            b'key,title,parent\nc,Child,p\ng,Grandchild,c\np,Parent,\n'), 'departments.csv')
+        self.assertEqual(report.created['departments'], 3)
+        self.assertEqual(report.errors, [])
+        child = Department.objects.get(title='Child')
+        self.assertEqual(child.parent.title, 'Parent')
+        self.assertEqual(Department.objects.get(title='Grandchild').parent_id, child.id)
+
+    def test_cycle(self):
+        report = Importer().import_departments(ndjson(
+            '{"key": "a", "title": "A", "parent": "b"}',
+            '{"key": "b", "title": "B", "parent": "a"}',
+            '{"key": "r", "title": "Root"}',
+        ), 'departments.ndjson')
+        self.assertEqual(report.created['departments'], 1)
+        self.assertEqual(report.failed['departments'], 2)
+        self.assertEqual(sorted(line for _, line, _ in self.errors(report)), [1, 2])
+        self.assertIn('cycle', report.errors[0]['errors'][0]['msg'])
+
+    def test_unknown_parent_key(self):
+        report = Importer().import_departments(ndjson(
+            '{"key": "a", "title": "A", "parent": "missing"}',
+        ), 'departments.ndjson')
+        self.assertEqual(report.created['departments'], 0)
+        self.assertEqual(self.errors(report), [('departments', 1, 'Unknown parent key: missing')])
+
+    def test_batches_are_separate_transactions(self):
+        department = Department.objects.create(title='D')
+        rows = [f'{{"first_name": "e{i}", "last_name": "x", "department_id": {department.id}}}' for i in range(5)]
+        rows[3] = '{"first_name": "bad"}'
+        with self.captureOnCommitCallbacks() as callbacks:
+            report = Importer(batch_size=2).import_employees(ndjson(*rows), 'employees.ndjson')
+        # 每个 batch 一个事务，每个事务提交后推送一条 employee.imported
+        self.assertEqual(len(callbacks), 3)
+        self.assertEqual(report.created['employees'], 4)
+        self.assertEqual(self.errors(report), [('employees', 4, 'field required')])
+        self.assertEqual(Employee.objects.count(), 4)
+
+    def test_error_truncation(self):
+        report = Importer(report=ImportReport(max_errors=2)).import_employees(
+            ndjson(*['{"first_name": "a"}'] * 5), 'employees.ndjson')
+        self.assertEqual(report.failed['employees'], 5)
+        self.assertEqual(len(report.errors), 2)
+        self.assertTrue(report.truncated)
+
+    def test_file_error_keeps_partial_report(self):
+        department = Department.objects.create(title='D')
+        # 坏字节放在文件后面，前面的批次先提交
+        rows = f'a,b,{department.id}\n' * 3000
+        employees = f'first_name,last_name,department_id\n{rows}'.encode() + b'\xff\xfe,x,1\n'
+        response = self.client.post('/api/import?batch_size=100', {
+            'departments': SimpleUploadedFile('departments.csv', b'key,title\nk,K\n'),
+            'employees': SimpleUploadedFile('employees.csv', employees),
+        })
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data['created']['departments'], 1)
+        self.assertGreater(data['created']['employees'], 0)
+        self.assertEqual(data['created']['employees'], Employee.objects.count())
+        self.assertEqual(data['errors'][0]['file'], 'employees')
+        self.assertEqual(data['errors'][0]['line'], 0)
+        # batch_size=100 时出错之前提交的一定是整批
+        self.assertEqual(data['created']['employees'] % 100, 0)
+
+    def test_batch_size_is_validated(self):
+        files = {'employees': SimpleUploadedFile('employees.csv', b'first_name,last_name,department_id\n')}
+        for batch_size in (-1, 0, 10 ** 9):
+            with self.subTest(batch_size=batch_size):
+                response = self.client.post(f'/api/import?batch_size={batch_size}', files)
+                self.assertEqual(response.status_code, 422)
+        self.assertEqual(Importer(batch_size=-1).batch_size, 1)
+        self.assertEqual(Importer(batch_size=10 ** 9).batch_size, MAX_BATCH_SIZE)
+
+
+class ContentAddressedStorageTest(TestCase):
+    def setUp(self):
+        self.media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media)
+        settings = override_settings(MEDIA_ROOT=self.media, BLOB_GRACE_PERIOD=0)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.storage = Employee._meta.get_field('cv').storage
+        self.department = Department.objects.create(title='D')
+
+    def employee(self, content):
+        employee = Employee(first_name='a', last_name='b', department=self.department)
+        employee.cv.save('cv.pdf', ContentFile(content), save=False)
+        with self.captureOnCommitCallbacks(execute=True):
+            employee.save()
+        return employee
+
+    def exists(self, name):
+        return os.path.exists(os.path.join(self.media, name))
+
+    def test_same_content_is_written_once(self):
+        with mock.patch.object(self.storage, '_write_temp', wraps=self.storage._write_temp) as save:
+            first = self.employee(b'same')
+            second = self.employee(b'same')
+        self.assertEqual(save.call_count, 1)
+        self.assertEqual(first.cv.name, second.cv.name)
+        self.assertRegex(first.cv.name, r'^cv/[0-9a-f]{2}/[0-9a-f]{64}\.pdf$')
+
+    def test_interrupted_write_leaves_no_blob(self):
+        class Interrupted(ContentFile):
+            def chunks(self, chunk_size=None):
+                yield b'trunc'
+                raise OSError('No space left on device')
+
+        content = Interrupted(b'complete')
+        content.content_digest = hashlib.sha256(b'complete').hexdigest()
+        with self.assertRaises(OSError):
+            self.storage.save('cv/cv.pdf', content)
+        name = self.storage.blob_name('cv/cv.pdf', content.content_digest)
+        self.assertFalse(self.exists(name))
+        self.assertEqual(os.listdir(os.path.join(self.media, os.path.dirname(name))), [])
+
+        # 同样的内容再上传时完整写入，而不是复用写了一半的文件
+        complete = ContentFile(b'complete')
+        complete.content_digest = content.content_digest
+        self.assertEqual(self.storage.save('cv/cv.pdf', complete), name)
+        with open(os.path.join(self.media, name), 'rb') as f:
+            self.assertEqual(f.read(), b'complete')
+
+    def test_release_on_replace(self):
+        employee = self.employee(b'old')
+        old = employee.cv.name
+        employee.cv.save('cv.pdf', ContentFile(b'new'), save=False)
+        with self.captureOnCommitCallbacks(execute=True):
+            employee.save()
+        self.assertFalse(self.exists(old))
+        self.assertTrue(self.exists(employee.cv.name))
+
+    def test_release_on_delete(self):
+        employee = self.employee(b'cv')
+        name = employee.cv.name
+        with self.captureOnCommitCallbacks(execute=True):
+            employee.delete()
+        self.assertFalse(self.exists(name))
+
+    def test_shared_blob_is_kept_until_last_reference(self):
+        first = self.employee(b'shared')
+        second = self.employee(b'shared')
+        with self.captureOnCommitCallbacks(execute=True):
+            first.delete()
+        self.assertTrue(self.exists(second.cv.name))
+        with self.captureOnCommitCallbacks(execute=True):
+            second.delete()
+        self.assertFalse(self.exists(second.cv.name))
+
+    def test_recently_saved_blob_is_left_for_gc(self):
+        employee = self.employee(b'cv')
+        name = employee.cv.name
+        with override_settings(BLOB_GRACE_PERIOD=3600), self.captureOnCommitCallbacks(execute=True):
+            employee.delete()
+        self.assertTrue(self.exists(name))
+        call_command('gc_blobs', grace=0, stdout=io.StringIO())
+        self.assertFalse(self.exists(name))
+
+    def test_deferred_cv_is_not_loaded(self):
+        self.employee(b'cv')
+        with self.assertNumQueries(1):
+            employees = list(Employee.objects.only('id', 'first_name'))
+        with CaptureQueriesContext(connection) as queries, self.captureOnCommitCallbacks(execute=True):
+            employees[0].save(update_fields=['first_name'])
+            employees[0].delete()
+        self.assertFalse([q['sql'] for q in queries if '"cv"' in q['sql']])
+
+    def test_gc_only_touches_blobs(self):
+        blob = 'cv/ab/ab' + '0' * 62 + '.pdf'
+        temp = 'cv/ab/.tmp-abc123'
+        others = ['manage.py', 'db.sqlite3', 'cv/notes.txt', 'cv/ab/not-a-digest.pdf', 'cv/cd/ab' + '0' * 62]
+        for name in [blob, temp] + others:
+            os.makedirs(os.path.dirname(os.path.join(self.media, name)), exist_ok=True)
+            with open(os.path.join(self.media, name), 'w') as f:
+                f.write('x')
+        call_command('gc_blobs', grace=0, stdout=io.StringIO())
+        self.assertFalse(self.exists(blob))
+        self.assertFalse(self.exists(temp))
+        for name in others:
+            self.assertTrue(self.exists(name), name)
+
+
+class FieldSetTest(TestCase):
+    def setUp(self):
+        self.parent = Department.objects.create(title='P')
+        self.department = Department.objects.create(title='D', parent=self.parent)
+        Employee.objects.create(id=1, first_name='a', last_name='b', department=self.department)
+        Employee.objects.create(id=3, first_name='c', last_name='d', department=self.parent)
+
+    def get(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json(), [q['sql'] for q in queries]
+
+    def test_unknown_fields(self):
+        for query in ('fields=nope', 'fields=id,department.nope', 'expand=nope',
+                      'fields=first_name.x', 'expand=department.title.x', 'expand=department.title'):
+            with self.subTest(query=query), self.assertLogs('django.request', 'WARNING'):
+                response = self.client.get(f'/api/list_employee_with_department?{query}')
+                self.assertEqual(response.status_code, 400)
+        with self.assertLogs('django.request', 'WARNING'):
+            response = self.client.get('/api/list_employee_with_department?fields=first_name.x')
+        self.assertEqual(response.json(), {'detail': 'Unknown field: first_name.x'})
+
+    def test_only_selected_columns(self):
+        data, queries = self.get('/api/employees?fields=id,first_name')
+        self.assertEqual(data, [{'id': 1, 'first_name': 'a'}, {'id': 3, 'first_name': 'c'}])
+        self.assertEqual(len(queries), 1)
+        self.assertIn('"first_name"', queries[0])
+        for column in ('"last_name"', '"birthdate"', '"cv"', '"department_id"'):
+            self.assertNotIn(column, queries[0])
+
+    def test_expand_joins_in_one_query(self):
+        data, queries = self.get('/api/list_employee_with_department?fields=first_name,department.title')
+        self.assertEqual(data, [
+            {'first_name': 'a', 'department': {'title': 'D'}},
+            {'first_name': 'c', 'department': {'title': 'P'}},
+        ])
+        self.assertEqual(len(queries), 1)
+        self.assertIn('JOIN "department"', queries[0])
+        self.assertNotIn('"last_name"', queries[0])
+        self.assertNotIn('"parent_id"', queries[0])
+
+    def test_nested_expand(self):
+        # expand 只点名嵌套对象时，这一层保留全部普通字段
+        data, queries = self.get(
+            '/api/list_employee_with_department?fields=id&expand=department.employees')
+        self.assertEqual(data[0]['id'], 1)
+        self.assertEqual(data[0]['department']['title'], 'D')
+        self.assertEqual([e['first_name'] for e in data[0]['department']['employees']], ['a'])
+        self.assertEqual(set(data[0]), {'id', 'department'})
+        # JOIN 一次 + 反向外键预取一次
+        self.assertEqual(len(queries), 2)
+
+    def test_reverse_relation_is_prefetched(self):
+        data, queries = self.get('/api/list_department_with_employees?fields=title,employees.first_name')
+        self.assertEqual(data, [
+            {'title': 'P', 'employees': [{'first_name': 'c'}]},
+            {'title': 'D', 'employees': [{'first_name': 'a'}]},
+        ])
+        self.assertEqual(len(queries), 2)
+        self.assertNotIn('"last_name"', queries[1])
+
+    def test_sparse_schema_is_cached_per_fieldset(self):
+        first = sparse_schema(EmployeeOut, freeze(build_tree(EmployeeOut, [('id',)], [])))
+        again = sparse_schema(EmployeeOut, freeze(build_tree(EmployeeOut, [('id',)], [])))
+        other = sparse_schema(EmployeeOut, freeze(build_tree(EmployeeOut, [('first_name',)], [])))
+        self.assertIs(first, again)
+        self.assertIsNot(first, other)
+        self.assertEqual(list(first.__fields__), ['id'])
+        self.assertEqual(list(other.__fields__), ['first_name'])
+
+
+class ChangeEventsTest(SimpleTestCase):
+    @override_settings(EVENTS_KEEPALIVE=0.01)
+    def test_resume_stream(self):
+        first = changes.publish('employee.updated', {'id': 1})
+        changes.publish('department.updated', {'id': 2})
+        third = changes.publish('employee.deleted', {'id': 3})
+        response = self.client.get('/api/events?topics=employee', HTTP_LAST_EVENT_ID=first.id,
+                                   HTTP_ACCEPT_ENCODING='gzip, br')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        self.assertEqual(response['Cache-Control'], 'no-cache')
+        # 事件流不能压缩，否则会被缓冲，客户端收不到
+        self.assertFalse(response.has_header('Content-Encoding'))
+        chunks = iter(response.streaming_content)
+        self.assertEqual(next(chunks), b'retry: 3000\n\n')
+        # 只补发 first 之后、符合 topics 的消息
+        self.assertEqual(next(chunks), third.encode().encode())
+        self.assertEqual(next(chunks), b': keepalive\n\n')
+        response.close()
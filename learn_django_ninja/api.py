@@ -1,20 +1,28 @@
 import datetime
-from typing import Any, List, Generic, TypeVar, Optional
+import logging
+from typing import Any, List, Generic, TypeVar
 from django.http import HttpRequest
 
-from django.shortcuts import get_object_or_404
-from ninja import ModelSchema, NinjaAPI, Schema, UploadedFile, File, Path, Query, Form, FilterSchema, pagination
+from ninja import Schema, UploadedFile, File, Path, Query, Form
 from ninja.security import HttpBearer, APIKeyQuery, HttpBasicAuth
 from pydantic import Field
 from pydantic.fields import ModelField
-from django.db.models import Q, Case, When
 
-from employee.models import Department, Employee
-from employee.schemas import EmployeeSchema, EmployeeIn, EmployeeOut
-from project.api import router as project_router
-
-api = NinjaAPI()
-api.add_router('', project_router)
+from learn_django_ninja.batch import router as batch_router
+from learn_django_ninja.lazy import LazyNinjaAPI
+from learn_django_ninja.profiling import profiler, router as profiling_router
+from learn_django_ninja.search import SearchIndex
+from learn_django_ninja.validation import fast_validation
+
+logger = logging.getLogger(__name__)
+
+api = LazyNinjaAPI()
+# employee 和 project 的 router 及其 schema 在第一次请求到对应前缀时才导入
+# employee 的接口原来写在本模块里，沿用原来的 operationId
+api.add_lazy_router('', 'employee.api.router', operation_id_module=__name__)
+api.add_lazy_router('project', 'project.api.router')
+api.add_router('_profiles', profiling_router)
+api.add_router('', batch_router)
 __all__ = ['api']
 
 
@@ -63,41 +71,6 @@ def me(request):
     return request.user
 
 
-@api.post('/employees', response=EmployeeSchema)
-def create_employee(request, payload: EmployeeIn, cv: UploadedFile = File(...)):
-    print(cv.file)
-    employee = Employee(**payload.dict())
-    employee.cv.save(cv.name, cv)
-    return employee
-
-
-@api.get('/employees/{employee_id}', response=EmployeeOut)
-def get_employee(request, employee_id: int):
-    employee = get_object_or_404(Employee, id=employee_id)
-    return employee
-
-
-@api.get('/employees', response=List[EmployeeOut])
-def list_employees(request):
-    return Employee.objects.all()
-
-
-@api.put('/employees/{employee_id}')
-def update_employee(request, employee_id: int, payload: EmployeeIn):
-    employee = get_object_or_404(Employee, id=employee_id)
-    for attr, value in payload.dict().items():
-        setattr(employee, attr, value)
-    employee.save()
-    return {'success': True}
-
-
-@api.delete("/employees/{employee_id}")
-def delete_employee(request, employee_id: int):
-    employee = get_object_or_404(Employee, id=employee_id)
-    employee.delete()
-    return {"success": True}
-
-
 @api.get("/items/{int:item_id}")
 def read_item(request, item_id):
     # item_id 仍是 '3' 不是 int类型
@@ -135,13 +108,15 @@ def even(request, date: PathDate = Query(...)):
 
 weapons = ["Ninjato", "Shuriken", "Katana",
            "Kama", "Kunai", "Naginata", "Yari"]
+# 修改 weapons 之后调用 weapon_index.sync(weapons)，索引只增删变化的部分
+weapon_index = SearchIndex(weapons)
 
 
 @api.get('/weapons')
 def list_weapons(request, q: str, limit: int = 10, offset: int = 0):
-    results = [w for w in weapons if q in w.lower()]
-    print(q, results)
-    return results[offset: offset + limit]
+    results = weapon_index.search(q, limit=limit, offset=offset)
+    logger.debug('weapons q=%r: %s', q, results)
+    return results
 
 
 @api.get("/example")
@@ -169,11 +144,13 @@ class Item(Schema):
 
 
 @api.post("/items")
+@fast_validation()
 def create(request, item: Item):
     return item
 
 
 @api.post("/items/{item_id}")
+@fast_validation()
 def update(request, item_id: int, item: Item, q: str):
     return {"item_id": item_id, "item": item.dict(), "q": q}
 
@@ -184,11 +161,13 @@ def login(request, username: str = Form(...), password: str = Form(...)):
 
 
 @api.post('/form_items')
+@fast_validation()
 def create_items_with_form(request, item: Item = Form(...)):
     return item
 
 
 @api.put("/form_items/{item_id}")
+@fast_validation()
 def update_item_with_form(request, item_id: int, q: str, item: Item = Form(...)):
     return {"item_id": item_id, "item": item.dict(), "q": q}
 
@@ -218,6 +197,7 @@ class Item(Schema):
 
 
 @api.post("/items-blank-default")
+@fast_validation()
 def update_with_form_default(request, item: Item = Form(...)):
     return item.dict()
 
@@ -225,7 +205,7 @@ def update_with_form_default(request, item: Item = Form(...)):
 @api.post('/upload')
 def upload(request, file: UploadedFile = File(...)):
     data = file.read()
-    print(data)
+    logger.debug('upload %s: %d bytes', file.name, len(data))
     return {'name': file.name, 'len': len(data)}
 
 
@@ -250,177 +230,6 @@ def create_user_with_json(request, details: UserDetails, file: UploadedFile = Fi
     return [details.dict(), file.name]
 
 
-class EmployeeFilterSchema(FilterSchema):
-    first_name: Optional[str] = Field(q='first_name__icontains')
-    last_name: Optional[str] = Field(q='last_name__icontains')
-    birthdate: Optional[datetime.date]
-
-
-class EmployeeSearchSchema(FilterSchema):
-    # 在一个字段级别的查询是 OR 的关系
-    # 字段级别的查询是 AND 的关系
-    search: Optional[str] = Field(
-        q=['first_name__icontains', 'last_name__icontains'])
-    birthdate: Optional[datetime.date]
-
-
-class EmployeeOrSearchSchema(FilterSchema):
-    search: Optional[str] = Field(
-        q=['first_name__icontains', 'last_name__icontains'],
-        expression_connector='AND'
-    )
-    birthdate: Optional[datetime.date]
-
-    class Config:
-        expression_connector = 'OR'
-
-
-@api.get('/list_employees', response=List[EmployeeSchema])
-def list_filter_employees(request, filters: EmployeeFilterSchema = Query(...)):
-    q = Q(cv__isnull=False) & Q(Case(When(cv='', then=False), default=True))
-    employees = Employee.objects.all()
-    employees = filters.filter(employees)
-    print(employees)
-    q &= filters.get_filter_expression()
-    print(q)
-    queryset = Employee.objects.filter(q)
-    print(queryset.query)
-    for qs in queryset:
-        print(qs.cv == '')
-    return queryset
-
-
-@api.get('/list_search_employees', response=List[EmployeeSchema])
-def list_search_employees(request, filters: EmployeeSearchSchema = Query(...)):
-    employees = Employee.objects.all()
-    employees = filters.filter(employees)
-    return employees
-
-
-@api.get('/list_or_search_employees', response=List[EmployeeSchema])
-def list_or_search_employees(request, filters: EmployeeOrSearchSchema = Query(...)):
-    employees = Employee.objects.all()
-    employees = filters.filter(employees)
-    return employees
-
-
-class EmployeeIgnoreNullSchema(FilterSchema):
-    search: Optional[str] = Field(
-        q=['first_name__icontains', 'last_name__icontains'],
-        expression_connector='OR'
-    )
-    cv: Optional[str] = Field(q='cv__icontains', ignore_one=False)
-
-    class Config:
-        ignore_none = True
-        expression_connector = 'OR'
-
-
-@api.get('list_ignore_null_employees', response=List[EmployeeSchema])
-def list_ignore_null_employees(request, filters: EmployeeIgnoreNullSchema = Query(...)):
-    employees = Employee.objects.all()
-    print(employees)
-    employees = filters.filter(employees)
-    print(employees.query)
-    print(Employee.objects.all().filter(cv__icontains=filters.cv).query)
-    return employees
-
-
-class EmployeeCustomFilterSchema(FilterSchema):
-    search: Optional[str] = Field(
-        q=['first_name__icontains', 'last_name__icontains'],
-        expression_connector='OR'
-    )
-    cv: Optional[str]
-
-    def filter_cv(self, cv: str) -> Q:
-        q = Q()
-        if cv:
-            q = Q(cv__icontains=cv) | Q(
-                Case(When(cv='', then=True), default=False))
-        print('filter_cv')
-        return q
-
-    def custom_expression(self) -> Q:
-        q = super().custom_expression()
-        print(q)
-        return q
-
-
-@api.get('/list_custom_sechma_employees', response=List[EmployeeSchema])
-def list_cstom_scema_employees(request, filters: EmployeeCustomFilterSchema = Query(...)):
-    employees = Employee.objects.all()
-    employees = filters.filter(employees)
-    return employees
-
-
-class DepartmentEmployeeSchema(Schema):
-    id: int
-    title: str
-    employees: List[EmployeeSchema]
-
-
-@api.get("/list_department_with_employees", response=List[DepartmentEmployeeSchema])
-def list_department_with_employees(request):
-    queryset = Department.objects.prefetch_related('employees').all()
-    return queryset
-
-
-class DepartmentModelSchema(ModelSchema):
-    employees: List[EmployeeSchema]
-
-    class Config:
-        model = Department
-        model_fields = '__all__'
-
-
-class EmployeeDepartmentModelSchema(ModelSchema):
-    department: DepartmentModelSchema
-
-    class Config:
-        model = Employee
-        model_fields = '__all__'
-
-
-@api.get('/list_employee_with_department', response=List[EmployeeDepartmentModelSchema])
-def list_employee_with_department(request):
-    # queryset = Employee.objects.select_related('department').all()
-    queryset = Employee.objects.filter(
-        id__in=(1, 3)).prefetch_related('department__employees').select_related('department').all()
-    print(queryset)
-    print(queryset.query)
-    return queryset
-
-
-class DepartmentParentSchema(ModelSchema):
-    class Config:
-        model = Department
-        model_fields = '__all__'
-
-
-class DepartmentChildrenSchema(DepartmentParentSchema):
-    children: List[DepartmentParentSchema]
-
-    class Config(DepartmentParentSchema.Config):
-        pass
-
-
-@api.get('/list_department_with_children', response=List[DepartmentChildrenSchema])
-def list_department_with_children(request):
-    queryset = Department.objects.prefetch_related('children').all()
-    print(queryset)
-    print(queryset.query)
-    return queryset
-
-
-@api.get("/list_employees_with_page", response=List[EmployeeSchema])
-@pagination.paginate(pagination.PageNumberPagination, pass_parameter='pagination_info')
-def list_employees_with_page(request, **kwargs):
-    page = kwargs['pagination_info'].page
-    print(page)
-    return Employee.objects.all()
-
-
 @api.get('/bearer', auth=AuthBearer())
 def bearer(request):
     return {'token': request.auth}
@@ -431,7 +240,7 @@ class ApiKey(APIKeyQuery):
 
     def authenticate(self, request: HttpRequest, key: str | None) -> Any | None:
         try:
-            print(key)
+            logger.debug('api key authentication: %s', 'present' if key else 'missing')
             return True
         except Exception as e:
             pass
@@ -439,7 +248,7 @@ class ApiKey(APIKeyQuery):
 
 @api.get('/apikey', auth=ApiKey())
 def apikey(request):
-    print(request.auth)
+    logger.debug('auth: %s', request.auth)
     return f'Hello {request.auth}'
 
 
@@ -456,3 +265,6 @@ def service_unavailable(request, exc):
         {"message": "Please retry later"},
         status=503,
     )
+
+
+profiler.install(api)
@@ -0,0 +1,14 @@
+from django.apps import AppConfig
+from django.conf import settings
+from django.db.backends.signals import connection_created
+
+
+class LearnDjangoNinjaConfig(AppConfig):
+    name = 'learn_django_ninja'
+
+    def ready(self):
+        from learn_django_ninja.log import SlowQueryLogger
+
+        slow_queries = SlowQueryLogger(
+            getattr(settings, 'LOG_SLOW_SQL_MS', 100), getattr(settings, 'LOG_SLOW_SQL_SAMPLE_RATE', 1.0))
+        connection_created.connect(slow_queries.install, weak=False)
@@ -0,0 +1,155 @@
+import asyncio
+import inspect
+import json
+import logging
+from typing import Any, Dict, List
+
+from asgiref.sync import async_to_sync, sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+from django.http import Http404, HttpRequest, QueryDict
+from django.urls import Resolver404, resolve
+from django.utils.http import urlencode
+from ninja import Router, Schema
+from ninja.errors import HttpError
+
+logger = logging.getLogger(__name__)
+
+router = Router()
+
+READ_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+# 子请求不继承这些 META，由子请求自己的参数决定
+REQUEST_SPECIFIC_META = ('CONTENT_TYPE', 'CONTENT_LENGTH', 'QUERY_STRING', 'REQUEST_METHOD', 'PATH_INFO')
+
+
+class BatchRequest(Schema):
+    method: str = 'GET'
+    path: str
+    query: Dict[str, Any] = {}
+    headers: Dict[str, str] = {}
+    body: Any = None
+
+
+class BatchIn(Schema):
+    requests: List[BatchRequest]
+    parallel: bool = False
+
+
+class BatchResult(Schema):
+    status: int
+    headers: Dict[str, str]
+    body: Any
+
+
+async def _await(awaitable):
+    return await awaitable
+
+
+def build_subrequest(request, item, path):
+    sub = HttpRequest()
+    sub.method = item.method.upper()
+    sub.path = sub.path_info = path
+    sub.META = {k: v for k, v in request.META.items() if k not in REQUEST_SPECIFIC_META}
+    sub.META['REQUEST_METHOD'] = sub.method
+    sub.META['PATH_INFO'] = path
+    query = urlencode(item.query, doseq=True)
+    sub.META['QUERY_STRING'] = query
+    sub.GET = QueryDict(query)
+    sub.COOKIES = request.COOKIES
+
+    body = b''
+    if item.body is not None:
+        body = json.dumps(item.body).encode()
+        sub.META['CONTENT_TYPE'] = 'application/json'
+    sub.META['CONTENT_LENGTH'] = str(len(body))
+    sub._body = body
+    for name, value in item.headers.items():
+        key = name.upper().replace('-', '_')
+        if key not in ('CONTENT_TYPE', 'CONTENT_LENGTH'):
+            key = f'HTTP_{key}'
+        sub.META[key] = value
+
+    # 外层请求已经跑过 session / auth 中间件，子请求直接复用结果
+    for attr in ('user', 'session', 'request_id', 'csrf_processing_done'):
+        if hasattr(request, attr):
+            setattr(sub, attr, getattr(request, attr))
+    return sub
+
+
+def to_result(response):
+    content = response.content
+    content_type = response.get('Content-Type', '')
+    body = content.decode(response.charset or 'utf-8', errors='replace')
+    if content_type.startswith('application/json') and content:
+        body = json.loads(content)
+    headers = {k: v for k, v in response.items() if k.lower() != 'content-length'}
+    return {'status': response.status_code, 'headers': headers, 'body': body}
+
+
+def dispatch(api, request, item):
+    """直接在 NinjaAPI 的 URL 里找到 operation 执行，不再经过外层中间件"""
+    path = api.root_path + item.path.lstrip('/')
+    try:
+        match = resolve(path)
+    except Resolver404:
+        return {'status': 404, 'headers': {}, 'body': {'detail': 'Not Found'}}
+    if match.namespace != api.urls_namespace or match.func == request.resolver_match.func:
+        return {'status': 400, 'headers': {}, 'body': {'detail': f'{item.path} cannot be used in a batch'}}
+
+    sub = build_subrequest(request, item, path)
+    sub.resolver_match = match
+    try:
+        response = match.func(sub, *match.args, **match.kwargs)
+        if inspect.isawaitable(response):
+            response = async_to_sync(_await)(response)
+    except Http404:
+        return {'status': 404, 'headers': {}, 'body': {'detail': 'Not Found'}}
+    except Exception:
+        # DEBUG 关闭时 ninja 会把未处理的异常继续抛出，这里按子请求兜住，其他子请求的结果照常返回
+        logger.exception('batch sub-request %s %s failed', sub.method, item.path)
+        return {'status': 500, 'headers': {}, 'body': {'detail': 'Internal Server Error'}}
+    if response.streaming:
+        # 流式响应（例如 SSE）可能永远不结束，异步的迭代器在这里也没法同步读取，直接拒绝
+        response.close()
+        return {'status': 400, 'headers': {}, 'body': {'detail': f'{item.path} is not batchable'}}
+    return to_result(response)
+
+
+def dispatch_in_thread(api, request, item):
+    try:
+        return dispatch(api, request, item)
+    finally:
+        # 并发执行时每个线程有自己的数据库连接，用完关掉
+        close_old_connections()
+
+
+@router.post('/batch', response=List[BatchResult])
+async def batch(request, payload: BatchIn):
+    limit = getattr(settings, 'BATCH_MAX_REQUESTS', 20)
+    if len(payload.requests) > limit:
+        raise HttpError(400, f'At most {limit} requests per batch')
+
+    api = router.api
+    if payload.parallel and hasattr(request, 'user'):
+        # request.user 是惰性对象，先在一个线程里取出来，避免并发的子请求同时去查 session
+        await sync_to_async(lambda: request.user.is_authenticated)()
+    results = [None] * len(payload.requests)
+    run = sync_to_async(dispatch)
+    run_parallel = sync_to_async(dispatch_in_thread, thread_sensitive=False)
+
+    i = 0
+    while i < len(payload.requests):
+        item = payload.requests[i]
+        if not payload.parallel or item.method.upper() not in READ_METHODS:
+            results[i] = await run(api, request, item)
+            i += 1
+            continue
+        # 连续的只读请求之间没有依赖，可以并发执行；写请求按顺序单独执行
+        j = i
+        while j < len(payload.requests) and payload.requests[j].method.upper() in READ_METHODS:
+            j += 1
+        results[i:j] = await asyncio.gather(
+            *(run_parallel(api, request, payload.requests[k]) for k in range(i, j)))
+        i = j
+    return results
@@ -0,0 +1,206 @@
+import asyncio
+import functools
+import zlib
+
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+
+try:
+    import brotli
+except ImportError:  # 可选依赖
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # 可选依赖
+    zstandard = None
+
+DEFAULT_LEVELS = {'zstd': 3, 'br': 4, 'gzip': 6}
+
+# 只压缩 API 的 JSON / NDJSON。HTML 页面（如 /admin/）里带 CSRF token，压缩后会暴露给 BREACH 攻击；
+# text/event-stream 要求每条事件立刻送达，也不能压缩
+COMPRESSIBLE_TYPES = (
+    'application/json',
+    'application/x-ndjson',
+)
+
+
+def available_encodings():
+    """按服务端偏好排序、且当前环境装了依赖的编码"""
+    encodings = []
+    if zstandard is not None:
+        encodings.append('zstd')
+    if brotli is not None:
+        encodings.append('br')
+    encodings.append('gzip')
+    return encodings
+
+
+def accepted_encodings(request):
+    """解析 Accept-Encoding，返回 {编码: q}（可能包含 '*'），q = 0 表示明确拒绝"""
+    accepted = {}
+    for part in request.headers.get('Accept-Encoding', '').split(','):
+        name, *params = [p.strip() for p in part.split(';')]
+        q = 1.0
+        for param in params:
+            key, _, value = param.partition('=')
+            if key.strip() == 'q':
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if name:
+            accepted[name.lower()] = q
+    return accepted
+
+
+def choose_encoding(request, encodings):
+    accepted = accepted_encodings(request)
+    for encoding in encodings:
+        # 明确列出的编码优先于 '*'，所以 'gzip;q=0, *' 不会选 gzip
+        if accepted.get(encoding, accepted.get('*', 0)) > 0:
+            return encoding
+    return None
+
+
+class StreamCompressor:
+    """gzip / br / zstd 统一成 compress、flush、finish 三个操作，可以边生成边压缩"""
+
+    def __init__(self, encoding, level):
+        self.encoding = encoding
+        if encoding == 'gzip':
+            self._obj = zlib.compressobj(level, zlib.DEFLATED, 31)
+        elif encoding == 'br':
+            self._obj = brotli.Compressor(quality=level)
+        elif encoding == 'zstd':
+            self._obj = zstandard.ZstdCompressor(level=level).compressobj()
+        else:
+            raise ValueError(f'Unsupported encoding: {encoding}')
+
+    def compress(self, data):
+        if self.encoding == 'br':
+            return self._obj.process(data)
+        return self._obj.compress(data)
+
+    def flush(self):
+        """把已输入的数据全部吐出，但不结束流，客户端可以立即解出这部分"""
+        if self.encoding == 'gzip':
+            return self._obj.flush(zlib.Z_SYNC_FLUSH)
+        if self.encoding == 'br':
+            return self._obj.flush()
+        return self._obj.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+
+    def finish(self):
+        if self.encoding == 'gzip':
+            return self._obj.flush(zlib.Z_FINISH)
+        if self.encoding == 'br':
+            return self._obj.finish()
+        return self._obj.flush(zstandard.COMPRESSOBJ_FLUSH_FINISH)
+
+
+def compress_bytes(data, encoding, level):
+    compressor = StreamCompressor(encoding, level)
+    return compressor.compress(data) + compressor.finish()
+
+
+def compress_stream(chunks, compressor, flush_size):
+    pending = 0
+    for chunk in chunks:
+        out = compressor.compress(chunk)
+        pending += len(chunk)
+        # 攒够 flush_size 再 flush，避免每个小块都 flush 拉低压缩率
+        if pending >= flush_size:
+            out += compressor.flush()
+            pending = 0
+        if out:
+            yield out
+    yield compressor.finish()
+
+
+async def acompress_stream(chunks, compressor, flush_size):
+    pending = 0
+    async for chunk in chunks:
+        out = compressor.compress(chunk)
+        pending += len(chunk)
+        if pending >= flush_size:
+            out += compressor.flush()
+            pending = 0
+        if out:
+            yield out
+    yield compressor.finish()
+
+
+def no_compression(view_func):
+    """单个 operation 关闭响应压缩，例如已经压缩过的内容或对延迟特别敏感的接口"""
+    if asyncio.iscoroutinefunction(view_func):
+        @functools.wraps(view_func)
+        async def async_wrapper(request, *args, **kwargs):
+            request.compress = False
+            return await view_func(request, *args, **kwargs)
+
+        return async_wrapper
+
+    @functools.wraps(view_func)
+    def wrapper(request, *args, **kwargs):
+        request.compress = False
+        return view_func(request, *args, **kwargs)
+
+    return wrapper
+
+
+class CompressionMiddleware:
+    """
+    按 Accept-Encoding 协商 zstd / br / gzip 压缩响应。
+    普通响应超过 COMPRESSION_MIN_SIZE 才压缩；StreamingHttpResponse 逐块增量压缩，不会缓冲整个响应。
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.min_size = getattr(settings, 'COMPRESSION_MIN_SIZE', 1024)
+        self.flush_size = getattr(settings, 'COMPRESSION_STREAM_FLUSH_SIZE', 16 * 1024)
+        self.levels = {**DEFAULT_LEVELS, **getattr(settings, 'COMPRESSION_LEVELS', {})}
+        encodings = getattr(settings, 'COMPRESSION_ENCODINGS', None) or available_encodings()
+        self.encodings = [e for e in encodings if e in available_encodings()]
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        return self.process_response(request, response)
+
+    def process_response(self, request, response):
+        if not getattr(request, 'compress', True):
+            return response
+        if response.has_header('Content-Encoding') or response.status_code in (204, 304):
+            return response
+        if not response.get('Content-Type', '').startswith(COMPRESSIBLE_TYPES):
+            return response
+        if not response.streaming and len(response.content) < self.min_size:
+            return response
+
+        # 不管最后是否压缩，响应内容都随 Accept-Encoding 变化
+        patch_vary_headers(response, ('Accept-Encoding',))
+        encoding = choose_encoding(request, self.encodings)
+        if encoding is None:
+            return response
+        compressor = StreamCompressor(encoding, self.levels[encoding])
+
+        if response.streaming:
+            if getattr(response, 'is_async', False):
+                response.streaming_content = acompress_stream(
+                    response.streaming_content, compressor, self.flush_size)
+            else:
+                response.streaming_content = compress_stream(
+                    response.streaming_content, compressor, self.flush_size)
+            del response.headers['Content-Length']
+        else:
+            compressed = compressor.compress(response.content) + compressor.finish()
+            if len(compressed) >= len(response.content):
+                return response
+            response.content = compressed
+            response.headers['Content-Length'] = str(len(compressed))
+
+        # 和 GZipMiddleware 一样，压缩后强 ETag 改为弱 ETag
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response.headers['ETag'] = 'W/' + etag
+        response.headers['Content-Encoding'] = encoding
+        return response
@@ -0,0 +1,150 @@
+from functools import lru_cache
+from typing import List, Optional
+
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Prefetch
+from ninja import Field, Schema
+from ninja.errors import HttpError
+from ninja.responses import Response
+from pydantic import BaseModel, create_model
+from pydantic.fields import SHAPE_LIST, SHAPE_SINGLETON
+from pydantic.utils import lenient_issubclass
+
+
+def is_nested(field):
+    return lenient_issubclass(field.type_, BaseModel) and field.shape in (SHAPE_SINGLETON, SHAPE_LIST)
+
+
+def split_paths(value):
+    if not value:
+        return []
+    return [tuple(part.strip().split('.')) for part in value.split(',') if part.strip()]
+
+
+def build_tree(schema, selected, expanded, path=()):
+    """
+    根据 ?fields= 和 ?expand= 生成字段树：{name: None（普通字段） | 子树（嵌套 schema）}。
+    - 某一层没有在 fields 里点名任何字段时，这一层保留全部普通字段；
+    - 嵌套对象只有在 fields 或 expand 里出现时才输出。
+    """
+    here = {p[len(path)] for p in selected if len(p) > len(path) and p[:len(path)] == path}
+    nested_here = {p[len(path)] for p in selected + expanded if len(p) > len(path) and p[:len(path)] == path}
+
+    unknown = nested_here - set(schema.__fields__)
+    if unknown:
+        name = '.'.join(path + (sorted(unknown)[0],))
+        raise HttpError(400, f'Unknown field: {name}')
+    for p in selected + expanded:
+        if len(p) > len(path) + 1 and p[:len(path)] == path and not is_nested(schema.__fields__[p[len(path)]]):
+            # first_name.x：普通字段下面没有子字段
+            raise HttpError(400, f'Unknown field: {".".join(p)}')
+    for p in expanded:
+        if len(p) == len(path) + 1 and p[:len(path)] == path and not is_nested(schema.__fields__[p[-1]]):
+            raise HttpError(400, f'Cannot expand {".".join(p)}: not a nested object')
+
+    tree = {}
+    for name, field in schema.__fields__.items():
+        if is_nested(field):
+            if name in nested_here:
+                tree[name] = build_tree(field.type_, selected, expanded, path + (name,))
+        elif not here or name in here:
+            tree[name] = None
+    return tree
+
+
+def freeze(tree):
+    return tuple((name, None if sub is None else freeze(sub)) for name, sub in tree.items())
+
+
+@lru_cache(maxsize=256)
+def sparse_schema(schema, frozen_tree):
+    """按字段树裁剪 schema，同样的字段组合只生成一次"""
+    definitions = {}
+    for name, sub in frozen_tree:
+        field = schema.__fields__[name]
+        if sub is None:
+            annotation = field.outer_type_
+        else:
+            annotation = sparse_schema(field.type_, sub)
+            if field.shape == SHAPE_LIST:
+                annotation = List[annotation]
+        if field.allow_none:
+            annotation = Optional[annotation]
+        default = ... if field.required else field.default
+        # 保留 alias：ModelSchema 的外键字段是通过 alias（如 department_id）从 ORM 对象取值的
+        definitions[name] = (annotation, Field(default, alias=field.alias))
+    model = create_model(f'{schema.__name__}Sparse', __base__=Schema, **definitions)
+    model._ninja_resolvers = {
+        k: v for k, v in getattr(schema, '_ninja_resolvers', {}).items() if k in definitions}
+    return model
+
+
+def project(queryset, schema, tree, required=()):
+    """把字段树转换成 only() / select_related() / Prefetch，只查询需要的列"""
+    only, select, prefetch = set(required), [], []
+    if not _collect(queryset.model, schema, tree, '', only, select, prefetch):
+        # 有无法对应到模型字段的属性（比如 property），这一层不做列裁剪
+        only = set()
+    if only:
+        queryset = queryset.only(*only)
+    if select:
+        queryset = queryset.select_related(*select)
+    if prefetch:
+        queryset = queryset.prefetch_related(*prefetch)
+    return queryset
+
+
+def _collect(model, schema, tree, prefix, only, select, prefetch):
+    projectable = True
+    only.add(prefix + model._meta.pk.name)
+    for name, sub in tree.items():
+        field = schema.__fields__[name]
+        try:
+            model_field = model._meta.get_field(field.alias)
+        except FieldDoesNotExist:
+            try:
+                model_field = model._meta.get_field(name)
+            except FieldDoesNotExist:
+                projectable = False
+                continue
+
+        if sub is None or not model_field.is_relation:
+            if model_field.concrete:
+                only.add(prefix + model_field.name)
+            continue
+
+        related_schema = field.type_
+        related_model = model_field.related_model
+        if model_field.many_to_one or (model_field.one_to_one and model_field.concrete):
+            # 正向外键：JOIN 进来，继续在同一个查询里裁剪关联表的列
+            only.add(prefix + model_field.name)
+            select.append(prefix + model_field.name)
+            projectable &= _collect(
+                related_model, related_schema, sub, f'{prefix}{model_field.name}__', only, select, prefetch)
+        else:
+            # 反向外键 / 多对多：单独的预取查询，同样只取需要的列；反向外键要按外键列回填，必须查出来
+            required = (model_field.field.name,) if model_field.one_to_many else ()
+            related_qs = project(related_model._default_manager.all(), related_schema, sub, required)
+            prefetch.append(Prefetch(prefix + model_field.get_accessor_name(), queryset=related_qs))
+    return projectable
+
+
+class FieldSet(Schema):
+    """列表接口通用的 ?fields=id,first_name,department.title 和 ?expand=department 参数"""
+
+    only: Optional[str] = Field(None, alias='fields')
+    expand: Optional[str] = None
+
+    @property
+    def is_sparse(self):
+        return bool(self.only or self.expand)
+
+    def tree(self, schema):
+        return build_tree(schema, split_paths(self.only), split_paths(self.expand))
+
+    def response(self, queryset, schema):
+        """按请求的字段生成裁剪后的 schema 和查询，直接返回序列化好的响应"""
+        tree = self.tree(schema)
+        sparse = sparse_schema(schema, freeze(tree))
+        queryset = project(queryset, schema, tree)
+        return Response([sparse.from_orm(obj).dict() for obj in queryset])
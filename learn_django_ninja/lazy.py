@@ -0,0 +1,130 @@
+import inspect
+import threading
+
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.http import Http404, HttpResponsePermanentRedirect
+from django.urls import URLResolver, path
+from django.urls.exceptions import Resolver404
+from django.urls.resolvers import RegexPattern
+from django.utils.module_loading import import_string
+from django.views.decorators.csrf import csrf_exempt
+from ninja import NinjaAPI
+from ninja.utils import normalize_path
+
+
+async def _await(awaitable):
+    return await awaitable
+
+
+class LazyRouter:
+    def __init__(self, prefix, import_path, kwargs, operation_id_module=None):
+        self.prefix = normalize_path(prefix).strip('/')
+        self.import_path = import_path
+        self.module = import_path.rpartition('.')[0]
+        self.kwargs = kwargs
+        self.operation_id_module = operation_id_module
+        self.router = None
+        self.routes = []
+
+    def matches(self, rest):
+        return not self.prefix or rest == self.prefix or rest.startswith(self.prefix + '/')
+
+
+class LazyNinjaAPI(NinjaAPI):
+    """
+    支持延迟加载 Router 的 NinjaAPI：add_lazy_router 只记录模块路径，
+    等第一次请求落到对应前缀（或生成 OpenAPI 文档）时才导入 router 和它的 schema。
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._lazy_routers = []
+        self._lazy_lock = threading.RLock()
+        self._lazy_resolver = None
+        # 延迟加载的 router 挂上之后回调，比如 profiler.install
+        self.router_loaded_callbacks = []
+
+    def add_lazy_router(self, prefix, import_path, operation_id_module=None, **kwargs):
+        """
+        operation_id_module：默认的 operationId 是 <模块>_<函数名>，接口从别的模块搬过来时传原来的模块名，
+        OpenAPI 文档里的 operationId 保持不变，生成的客户端不受影响
+        """
+        self._lazy_routers.append(LazyRouter(prefix, import_path, kwargs, operation_id_module))
+
+    def get_openapi_operation_id(self, operation):
+        module = operation.view_func.__module__
+        for lazy in self._lazy_routers:
+            if lazy.operation_id_module and lazy.module == module:
+                return f'{lazy.operation_id_module}_{operation.view_func.__name__}'.replace('.', '_')
+        return super().get_openapi_operation_id(operation)
+
+    @property
+    def pending_routers(self):
+        return [lazy.import_path for lazy in self._lazy_routers if lazy.router is None]
+
+    def load_routers(self, rest=None):
+        """导入尚未加载、且前缀与 rest 匹配的 router；rest 为 None 时全部加载"""
+        pending = [lazy for lazy in self._lazy_routers
+                   if lazy.router is None and (rest is None or lazy.matches(rest))]
+        if not pending:
+            return
+        with self._lazy_lock:
+            loaded = False
+            for lazy in pending:
+                if lazy.router is not None:
+                    continue
+                router = import_string(lazy.import_path)
+                start = len(self._routers)
+                self.add_router(lazy.prefix, router, **lazy.kwargs)
+                lazy.routes = self._routers[start:]
+                lazy.router = router
+                loaded = True
+            if loaded:
+                self._lazy_resolver = None
+                for callback in self.router_loaded_callbacks:
+                    callback(self)
+
+    def _get_lazy_resolver(self):
+        with self._lazy_lock:
+            if self._lazy_resolver is None:
+                patterns = []
+                for lazy in self._lazy_routers:
+                    for prefix, router in lazy.routes:
+                        patterns.extend(router.urls_paths(prefix))
+                self._lazy_resolver = URLResolver(RegexPattern(r'^'), patterns)
+            return self._lazy_resolver
+
+    def _lazy_view(self, request, rest):
+        self.load_routers(rest)
+        try:
+            match = self._get_lazy_resolver().resolve(rest)
+        except Resolver404:
+            if self._should_append_slash(request, rest):
+                # catch-all 让所有路径都能解析，CommonMiddleware 不再做 APPEND_SLASH 跳转，这里代替它
+                return HttpResponsePermanentRedirect(request.get_full_path(force_append_slash=True))
+            raise Http404
+        response = match.func(request, *match.args, **match.kwargs)
+        if inspect.isawaitable(response):
+            response = async_to_sync(_await)(response)
+        return response
+
+    def _should_append_slash(self, request, rest):
+        if not settings.APPEND_SLASH or rest.endswith('/') or request.method not in ('GET', 'HEAD'):
+            return False
+        try:
+            self._get_lazy_resolver().resolve(rest + '/')
+        except Resolver404:
+            return False
+        return True
+
+    def _get_urls(self):
+        urls = super()._get_urls()
+        if self._lazy_routers:
+            # 放在最后：已加载的 router 优先匹配，剩下的再交给延迟加载的 router
+            urls.append(path('<path:rest>', csrf_exempt(self._lazy_view)))
+        return urls
+
+    def get_openapi_schema(self, path_prefix=None):
+        self.load_routers()
+        return super().get_openapi_schema(path_prefix)
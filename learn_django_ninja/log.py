@@ -0,0 +1,138 @@
+import contextvars
+import copy
+import json
+import logging
+import queue
+import random
+import re
+import sys
+import time
+import uuid
+from logging.handlers import QueueHandler, QueueListener
+
+request_id_var = contextvars.ContextVar('request_id', default='-')
+
+REQUEST_ID_RE = re.compile(r'^[\w.-]{1,64}$')
+
+# LogRecord 自带的属性，JSON 里只输出这些之外的 extra 字段
+RESERVED_ATTRS = frozenset(vars(logging.makeLogRecord({}))) | {'message', 'asctime', 'request_id'}
+
+
+class RequestIdMiddleware:
+    """给每个请求分配 request id，沿用上游传来的 X-Request-ID，并写回响应头"""
+
+    header = 'X-Request-ID'
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request_id = request.headers.get(self.header, '')
+        if not REQUEST_ID_RE.match(request_id):
+            request_id = uuid.uuid4().hex
+        request.request_id = request_id
+        token = request_id_var.set(request_id)
+        try:
+            response = self.get_response(request)
+        finally:
+            request_id_var.reset(token)
+        response[self.header] = request_id
+        return response
+
+
+class RequestIdFilter(logging.Filter):
+    def filter(self, record):
+        request_id = request_id_var.get()
+        if request_id == '-':
+            # django.request 的 4xx 日志在所有中间件返回之后才写，那时 contextvar 已经复原，从 record.request 取
+            request_id = getattr(getattr(record, 'request', None), 'request_id', '-')
+        record.request_id = request_id
+        return True
+
+
+class SlowQueryLogger:
+    """
+    connection.execute_wrapper：给每条 SQL 计时，只有超过阈值的才生成日志（可再按比例抽样）。
+    与 DEBUG 无关，也不会像 django.db.backends 那样先为每条 SQL 创建 LogRecord 再过滤。
+    """
+
+    def __init__(self, threshold_ms=100, rate=1.0, logger_name='learn_django_ninja.sql'):
+        self.threshold = threshold_ms / 1000
+        self.rate = rate
+        self.logger = logging.getLogger(logger_name)
+
+    def __call__(self, execute, sql, params, many, context):
+        t0 = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - t0
+            if duration >= self.threshold and (self.rate >= 1 or random.random() < self.rate):
+                self.logger.warning(
+                    'slow query (%.1f ms)', duration * 1000,
+                    extra={'duration': duration, 'sql': sql, 'params': params, 'many': many,
+                           'alias': context['connection'].alias})
+
+    def install(self, sender, connection, **kwargs):
+        """connection_created 的接收函数；同一个连接对象重连时也会触发，不重复安装"""
+        if self not in connection.execute_wrappers:
+            connection.execute_wrappers.append(self)
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        data = {
+            'ts': self.formatTime(record),
+            'level': record.levelname,
+            'logger': record.name,
+            'request_id': getattr(record, 'request_id', '-'),
+            'message': record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in RESERVED_ATTRS and key not in data:
+                data[key] = value
+        if record.exc_info:
+            data['exc'] = self.formatException(record.exc_info)
+        return json.dumps(data, ensure_ascii=False, default=str)
+
+
+class QueueingHandler(QueueHandler):
+    """
+    请求线程只把日志放进队列，格式化和写 stream 由后台 QueueListener 完成。
+    队列满时直接丢弃并计数，不会阻塞请求。
+    后台线程在第一次写日志时才启动，dictConfig 时（包括每个管理命令）不会启动。
+    """
+
+    def __init__(self, stream=None, maxsize=10000):
+        super().__init__(queue.Queue(maxsize))
+        self.target = logging.StreamHandler(stream or sys.stderr)
+        self.dropped = 0
+        self.listener = QueueListener(self.queue, self.target)
+        self._closed = False
+
+    def setFormatter(self, fmt):
+        super().setFormatter(fmt)
+        self.target.setFormatter(fmt)
+
+    def prepare(self, record):
+        # 只把参数合并进 msg，保证后台线程格式化时不受调用方后续修改影响
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+    def enqueue(self, record):
+        # Handler.handle() 已经持有 self.lock，这里检查再启动不会重复启动
+        if self.listener._thread is None and not self._closed:
+            self.listener.start()
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def close(self):
+        # logging.shutdown() 退出时会调用 close，把队列里剩下的日志写完
+        self._closed = True
+        if self.listener._thread is not None:
+            self.listener.stop()
+        super().close()
@@ -0,0 +1,82 @@
+import json
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+
+from learn_django_ninja.compression import StreamCompressor, available_encodings
+
+DEFAULT_PATHS = [
+    '/api/employees',
+    '/api/list_department_with_employees',
+    '/api/list_employee_with_department',
+]
+
+
+class Command(BaseCommand):
+    help = '对列表接口的 JSON 响应比较各压缩算法、各级别的 CPU 耗时和压缩后大小'
+
+    def add_arguments(self, parser):
+        parser.add_argument('paths', nargs='*', default=DEFAULT_PATHS)
+        parser.add_argument('--file', help='直接读取一个 JSON 文件作为测试数据，不请求接口')
+        parser.add_argument('--scale', type=int, default=1,
+                            help='把列表响应重复 N 次，模拟数据量大的生产环境')
+        parser.add_argument('--chunk', type=int, default=0,
+                            help='按这个大小分块并逐块 flush，模拟流式响应；0 表示整体压缩')
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--host', default='localhost')
+
+    def handle(self, *args, **options):
+        payloads = []
+        if options['file']:
+            with open(options['file'], 'rb') as f:
+                payloads.append((options['file'], f.read()))
+        else:
+            client = Client(HTTP_HOST=options['host'])
+            for path in options['paths']:
+                response = client.get(path)
+                if response.status_code != 200:
+                    raise CommandError(f'GET {path} -> {response.status_code}')
+                payloads.append((path, response.content))
+
+        levels = {
+            'gzip': [1, 6, 9],
+            'br': [1, 4, 6, 11],
+            'zstd': [1, 3, 9, 19],
+        }
+        for name, data in payloads:
+            data = self.scale(data, options['scale'])
+            self.stdout.write(f'\n{name}: {len(data)} bytes')
+            self.stdout.write(f'{"encoding":>9} {"level":>5} {"bytes":>10} {"ratio":>7} {"ms":>9} {"MB/s":>8}')
+            for encoding in available_encodings():
+                for level in levels[encoding]:
+                    size, seconds = self.measure(data, encoding, level, options['chunk'], options['repeat'])
+                    self.stdout.write(
+                        f'{encoding:>9} {level:>5} {size:>10} {len(data) / size:>7.2f} '
+                        f'{seconds * 1000:>9.2f} {len(data) / seconds / 1e6:>8.1f}')
+
+    @staticmethod
+    def scale(data, times):
+        if times <= 1:
+            return data
+        value = json.loads(data)
+        if not isinstance(value, list):
+            return data
+        return json.dumps(value * times).encode()
+
+    @staticmethod
+    def measure(data, encoding, level, chunk, repeat):
+        best = None
+        for _ in range(repeat):
+            t0 = time.perf_counter()
+            compressor = StreamCompressor(encoding, level)
+            if chunk:
+                size = 0
+                for i in range(0, len(data), chunk):
+                    size += len(compressor.compress(data[i:i + chunk])) + len(compressor.flush())
+                size += len(compressor.finish())
+            else:
+                size = len(compressor.compress(data)) + len(compressor.finish())
+            elapsed = time.perf_counter() - t0
+            best = elapsed if best is None else min(best, elapsed)
+        return size, best
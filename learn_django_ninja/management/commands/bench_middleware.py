@@ -0,0 +1,63 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+
+from learn_django_ninja.routing import DEFAULT_LEAN_MIDDLEWARE, MiddlewareStack
+
+DEFAULT_PATHS = [
+    '/api/math?a=1&b=2',
+    '/api/bearer',
+    '/api/apikey?api_key=secret',
+]
+
+
+class Command(BaseCommand):
+    help = '比较完整中间件和 RoutedMiddleware 精简中间件处理同一个 API 请求的耗时和 SQL 次数'
+
+    def add_arguments(self, parser):
+        parser.add_argument('paths', nargs='*', default=DEFAULT_PATHS)
+        parser.add_argument('--number', type=int, default=2000)
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--cookie', help='带上这个 sessionid，模拟浏览器里同时登录了 admin 的客户端')
+        parser.add_argument('--host', default='localhost')
+
+    def handle(self, *args, **options):
+        middleware = list(settings.MIDDLEWARE)
+        routed = 'learn_django_ninja.routing.RoutedMiddleware'
+        full_middleware = middleware[middleware.index(routed) + 1:] if routed in middleware else middleware
+        stacks = {
+            'full': MiddlewareStack(full_middleware),
+            'lean': MiddlewareStack(getattr(settings, 'LEAN_MIDDLEWARE', DEFAULT_LEAN_MIDDLEWARE)),
+        }
+
+        factory = RequestFactory(HTTP_HOST=options['host'], HTTP_AUTHORIZATION='Bearer supersecret')
+        if options['cookie']:
+            factory.cookies[settings.SESSION_COOKIE_NAME] = options['cookie']
+
+        self.stdout.write(f'{"path":<32} {"stack":>5} {"status":>6} {"queries":>7} {"us/req":>9} {"saved":>9}')
+        for path in options['paths']:
+            results = {}
+            for name, stack in stacks.items():
+                with CaptureQueriesContext(connection) as queries:
+                    response = stack(factory.get(path))
+                seconds = self.measure(stack, factory, path, options['number'], options['repeat'])
+                results[name] = seconds
+                saved = '' if name == 'full' else f'{(results["full"] - seconds) * 1e6:>9.2f}'
+                self.stdout.write(
+                    f'{path:<32} {name:>5} {response.status_code:>6} {len(queries):>7} {seconds * 1e6:>9.2f} {saved}')
+
+    @staticmethod
+    def measure(stack, factory, path, number, repeat):
+        best = None
+        for _ in range(repeat):
+            requests = [factory.get(path) for _ in range(number)]
+            t0 = time.perf_counter()
+            for request in requests:
+                stack(request)
+            elapsed = (time.perf_counter() - t0) / number
+            best = elapsed if best is None else min(best, elapsed)
+        return best
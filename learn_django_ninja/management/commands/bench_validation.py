@@ -0,0 +1,62 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from learn_django_ninja.api import api
+from learn_django_ninja.validation import ENGINES, FieldErrors, Unsupported, get_validator
+
+# 每个 operation 一份有代表性的请求体（已经是 _map_data_paths 之后的结构）
+SAMPLES = {
+    'create': {'item': {'name': 'Apple', 'description': 'fresh', 'price': '3.5', 'quantity': '12'}},
+    'create_items_with_form': {'item': {'name': 'Apple', 'price': '3.5', 'quantity': '12'}},
+    'update_with_form_default': {'item': {'name': 'Apple', 'price': '', 'quantity': '12', 'in_stock': ''}},
+    'update_employee': {'payload': {'first_name': 'Ada', 'last_name': 'Lovelace', 'department_id': 1,
+                                    'birthdate': '1815-12-10'}},
+}
+
+
+class Command(BaseCommand):
+    help = '比较 pydantic 与 fast_validation 各引擎（compiled / msgspec）校验请求体的耗时'
+
+    def add_arguments(self, parser):
+        parser.add_argument('operations', nargs='*', default=list(SAMPLES))
+        parser.add_argument('--number', type=int, default=20000)
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        api.load_routers()
+        operations = {}
+        for _, router in api._routers:
+            for path_view in router.path_operations.values():
+                for operation in path_view.operations:
+                    operations[operation.view_func.__name__] = operation
+
+        self.stdout.write(f'{"operation":<26} {"engine":>9} {"us/op":>8} {"speedup":>8}')
+        for name in options['operations']:
+            if name not in operations or name not in SAMPLES:
+                raise CommandError(f'Unknown operation: {name}')
+            data = SAMPLES[name]
+            model = next(m for m in operations[name].models if m._param_source in ('body', 'form'))
+
+            baseline = self.measure(lambda: model(**data), options['number'], options['repeat'])
+            self.stdout.write(f'{name:<26} {"pydantic":>9} {baseline * 1e6:>8.2f} {1:>8.2f}')
+            for engine in ENGINES:
+                try:
+                    validator = get_validator(model, engine)
+                    validator.validate(data)
+                except (Unsupported, FieldErrors) as e:
+                    self.stdout.write(f'{name:<26} {engine:>9} skipped: {e}')
+                    continue
+                seconds = self.measure(lambda: validator.validate(data), options['number'], options['repeat'])
+                self.stdout.write(f'{name:<26} {engine:>9} {seconds * 1e6:>8.2f} {baseline / seconds:>8.2f}')
+
+    @staticmethod
+    def measure(func, number, repeat):
+        best = None
+        for _ in range(repeat):
+            t0 = time.perf_counter()
+            for _ in range(number):
+                func()
+            elapsed = (time.perf_counter() - t0) / number
+            best = elapsed if best is None else min(best, elapsed)
+        return best
@@ -0,0 +1,20 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from learn_django_ninja.api import api
+from learn_django_ninja.openapi import OpenAPIDocument
+
+
+class Command(BaseCommand):
+    help = '生成 OpenAPI 文档并连同 .gz / .br 压缩版本写到磁盘，供部署时预先生成或离线使用'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', default=None,
+                            help='输出文件，默认 OPENAPI_SCHEMA_PATH 或 openapi.json')
+
+    def handle(self, *args, **options):
+        output = options['output'] or getattr(settings, 'OPENAPI_SCHEMA_PATH', None) or 'openapi.json'
+        document = OpenAPIDocument.build(api)
+        for path in document.write(output):
+            self.stdout.write(f'{path} ({path.stat().st_size} bytes)')
+        self.stdout.write(f'sha256: {document.digest}')
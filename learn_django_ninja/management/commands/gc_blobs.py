@@ -0,0 +1,59 @@
+import posixpath
+
+from django.core.files.storage import storages
+from django.core.management.base import BaseCommand, CommandError
+
+from learn_django_ninja.storage import ContentAddressedStorage, file_fields
+
+
+def blob_dirs(storage):
+    """只扫描使用这个 storage 的 FileField 的 upload_to 目录，不碰存储根目录下的其他文件"""
+    dirs = set()
+    for model, field in file_fields(storage):
+        # upload_to 里的 strftime 占位符之前的部分是固定目录
+        path = field.upload_to.split('%')[0].strip('/') if isinstance(field.upload_to, str) else ''
+        if not path:
+            raise CommandError(f'{model.__name__}.{field.name} needs a fixed upload_to directory')
+        dirs.add(path)
+    return sorted(dirs)
+
+
+def walk(storage, path):
+    dirs, files = storage.listdir(path)
+    for name in files:
+        yield posixpath.join(path, name)
+    for name in dirs:
+        yield from walk(storage, posixpath.join(path, name))
+
+
+class Command(BaseCommand):
+    help = '删除按内容寻址存储里没有任何记录引用的文件（例如上传后保存记录失败留下的）'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--storage', default='cv', help='STORAGES 里的名字')
+        parser.add_argument('--grace', type=int,
+                            help='只清理这么多秒内没有被保存过的文件，避免误删刚上传、记录还没提交的文件，'
+                                 '默认 BLOB_GRACE_PERIOD')
+        parser.add_argument('--dry-run', action='store_true')
+
+    def handle(self, *args, **options):
+        storage = storages[options['storage']]
+        if not isinstance(storage, ContentAddressedStorage):
+            raise CommandError(f'{options["storage"]} is not a ContentAddressedStorage')
+
+        count = size = 0
+        for path in blob_dirs(storage):
+            if not storage.exists(path):
+                continue
+            for name in walk(storage, path):
+                # 不是 <摘要前两位>/<摘要><扩展名> 格式、也不是写入中途留下的临时文件，就不是这个存储写的，一律不动
+                if not storage.is_blob_name(name) and not storage.is_temp_name(name):
+                    continue
+                file_size = storage.size(name)
+                if not storage.collect(name, options['grace'], options['dry_run']):
+                    continue
+                count += 1
+                size += file_size
+                self.stdout.write(name)
+        action = 'would remove' if options['dry_run'] else 'removed'
+        self.stdout.write(f'{action} {count} orphaned files, {size} bytes')
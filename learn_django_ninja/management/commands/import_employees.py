@@ -0,0 +1,40 @@
+from contextlib import ExitStack
+
+from django.core.management.base import BaseCommand, CommandError
+
+from employee.importer import Importer
+
+
+class Command(BaseCommand):
+    help = '从 CSV / NDJSON 文件批量导入部门和员工，文件的列见 employee.importer.Importer'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--departments', help='部门文件')
+        parser.add_argument('--employees', help='员工文件，department 列可以引用部门文件里的 key')
+        parser.add_argument('--format', choices=['csv', 'ndjson'], help='默认按扩展名判断')
+        parser.add_argument('--batch-size', type=int, help='每个事务写入的行数，默认 IMPORT_BATCH_SIZE')
+
+    def handle(self, *args, **options):
+        if not options['departments'] and not options['employees']:
+            raise CommandError('Pass --departments and/or --employees')
+        with ExitStack() as stack:
+            try:
+                files = {
+                    kind: (stack.enter_context(open(options[kind], 'rb')), options[kind])
+                    for kind in ('departments', 'employees') if options[kind]
+                }
+            except OSError as e:
+                raise CommandError(e)
+            report = Importer(options['batch_size']).import_files(files, options['format'])
+
+        for error in report.errors:
+            messages = '; '.join(f'{".".join(map(str, e["loc"]))}: {e["msg"]}' if e['loc'] else e['msg']
+                                 for e in error['errors'])
+            location = f'{error["file"]}:{error["line"]}' if error['line'] else error['file']
+            self.stderr.write(f'{location}: {messages}')
+        if report.truncated:
+            self.stderr.write(f'... only the first {len(report.errors)} errors are shown')
+        for kind in ('departments', 'employees'):
+            self.stdout.write(f'{kind}: {report.created[kind]} created, {report.failed[kind]} failed')
+        if any(error['line'] == 0 for error in report.errors):
+            raise CommandError('Import stopped early, see the errors above')
@@ -0,0 +1,69 @@
+import os
+import re
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+LINE_RE = re.compile(r'^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)$')
+
+BOOT_CODE = '''
+import django
+django.setup()
+import {urlconf}
+for name in {modules!r}:
+    __import__(name)
+'''
+
+
+class Command(BaseCommand):
+    help = '在子进程里用 -X importtime 启动项目（django.setup + ROOT_URLCONF），按模块统计导入耗时'
+
+    def add_arguments(self, parser):
+        parser.add_argument('modules', nargs='*', help='额外要导入并计时的模块，例如 employee.api')
+        parser.add_argument('--top', type=int, default=25)
+        parser.add_argument('--sort', choices=['cumulative', 'self'], default='cumulative')
+        parser.add_argument('--project-only', action='store_true', help='只显示项目自己的模块')
+
+    def handle(self, *args, **options):
+        code = BOOT_CODE.format(urlconf=settings.ROOT_URLCONF, modules=options['modules'])
+        proc = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', code],
+            cwd=settings.BASE_DIR, capture_output=True, text=True)
+        if proc.returncode:
+            raise CommandError(proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else 'import failed')
+
+        rows = []
+        for line in proc.stderr.splitlines():
+            match = LINE_RE.match(line)
+            if match:
+                self_us, cumulative_us, indent, name = match.groups()
+                rows.append((name, int(self_us), int(cumulative_us), len(indent) // 2))
+        if not rows:
+            raise CommandError('没有拿到 -X importtime 的输出')
+
+        # 顶层导入（缩进最浅）的累计时间之和就是总耗时
+        min_depth = min(depth for *_, depth in rows)
+        total = sum(cumulative for _, _, cumulative, depth in rows if depth == min_depth)
+
+        if options['project_only']:
+            local = tuple(f'{name}.' for name in self.local_packages())
+            rows = [row for row in rows if row[0].startswith(local) or row[0] in {p[:-1] for p in local}]
+
+        key = 2 if options['sort'] == 'cumulative' else 1
+        rows.sort(key=lambda row: row[key], reverse=True)
+
+        self.stdout.write(f'total import time: {total / 1000:.1f} ms ({len(rows)} modules shown)')
+        self.stdout.write(f'{"cumulative ms":>14} {"self ms":>9}  module')
+        for name, self_us, cumulative_us, _ in rows[:options['top']]:
+            self.stdout.write(f'{cumulative_us / 1000:14.1f} {self_us / 1000:9.1f}  {name}')
+
+    @staticmethod
+    def local_packages():
+        base = str(settings.BASE_DIR)
+        packages = set()
+        for entry in os.listdir(base):
+            if os.path.isfile(os.path.join(base, entry, '__init__.py')):
+                packages.add(entry)
+        return packages
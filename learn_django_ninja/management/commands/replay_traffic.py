@@ -0,0 +1,169 @@
+import json
+import statistics
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from urllib.error import HTTPError
+from urllib.parse import urlencode
+from urllib.request import Request, urlopen
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from learn_django_ninja.traffic import sample_value
+
+
+def build_body(record):
+    body = record.get('body')
+    if not body:
+        return None, None
+    if 'json' in body:
+        return json.dumps(sample_value(body['json'])).encode(), 'application/json'
+    if 'form' in body:
+        form = sample_value(body['form'])
+        files = body.get('files') or {}
+        if not files:
+            return urlencode(form).encode(), 'application/x-www-form-urlencoded'
+        return build_multipart(form, files)
+    return b'x' * body.get('raw', 0), record.get('content_type')
+
+
+def build_multipart(form, files):
+    boundary = uuid.uuid4().hex
+    parts = []
+    for name, value in form.items():
+        parts.append(
+            f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode())
+    for name, sizes in files.items():
+        for i, size in enumerate(sizes):
+            parts.append(
+                f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"; filename="{name}{i}.bin"\r\n'
+                f'Content-Type: application/octet-stream\r\n\r\n'.encode() + b'0' * size + b'\r\n')
+    parts.append(f'--{boundary}--\r\n'.encode())
+    return b''.join(parts), f'multipart/form-data; boundary={boundary}'
+
+
+def percentile(values, p):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p / 100))]
+
+
+class Command(BaseCommand):
+    help = '把 TrafficRecorderMiddleware 记录的请求按原始节奏回放到本地服务'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--file', default=str(getattr(settings, 'TRAFFIC_LOG_PATH', 'traffic.jsonl')))
+        parser.add_argument('--base-url', default='http://127.0.0.1:8000')
+        parser.add_argument('--concurrency', type=int, default=8)
+        parser.add_argument('--speedup', type=float, default=1.0,
+                            help='回放加速倍数，0 表示不等待、尽可能快地发送')
+        parser.add_argument('--limit', type=int, default=None)
+        parser.add_argument('--timeout', type=float, default=30.0)
+        parser.add_argument('-H', '--header', action='append', default=[],
+                            help='附加请求头，例如 "Authorization: Bearer supersecret"')
+
+    def handle(self, *args, **options):
+        records = self.load(options['file'], options['limit'])
+        if not records:
+            raise CommandError(f'{options["file"]} 中没有可回放的请求')
+
+        headers = {}
+        for header in options['header']:
+            name, _, value = header.partition(':')
+            headers[name.strip()] = value.strip()
+
+        base_url = options['base_url'].rstrip('/')
+        speedup = options['speedup']
+        timeout = options['timeout']
+        results = []
+        lock = threading.Lock()
+
+        def fire(record):
+            url = base_url + record['path']
+            if record.get('query'):
+                url += '?' + record['query']
+            data, content_type = build_body(record)
+            req = Request(url, data=data, method=record['method'], headers=headers)
+            if content_type:
+                req.add_header('Content-Type', content_type)
+            t0 = time.perf_counter()
+            try:
+                with urlopen(req, timeout=timeout) as resp:
+                    resp.read()
+                    status = resp.status
+            except HTTPError as e:
+                status = e.code
+            except Exception:
+                # 连接失败、超时、连接被重置、响应不完整等，都算作没有拿到响应
+                status = None
+            elapsed = (time.perf_counter() - t0) * 1000
+            with lock:
+                results.append((record, status, elapsed))
+
+        first_ts = records[0]['ts']
+        started = time.perf_counter()
+        futures = []
+        with ThreadPoolExecutor(max_workers=options['concurrency']) as executor:
+            for record in records:
+                if speedup > 0:
+                    delay = (record['ts'] - first_ts) / speedup - (time.perf_counter() - started)
+                    if delay > 0:
+                        time.sleep(delay)
+                futures.append(executor.submit(fire, record))
+        wall = time.perf_counter() - started
+        # fire 自身出错（例如记录格式不对）不能悄悄丢掉
+        for future in futures:
+            future.result()
+
+        self.report(results, wall)
+
+    def load(self, path, limit):
+        records = []
+        try:
+            with open(path, encoding='utf-8') as f:
+                for line in f:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    record = json.loads(line)
+                    # 跳过不是流量记录的行
+                    if 'method' in record and 'path' in record and 'ts' in record:
+                        records.append(record)
+        except FileNotFoundError:
+            raise CommandError(f'找不到流量记录文件 {path}')
+        records.sort(key=lambda r: r['ts'])
+        return records[:limit] if limit else records
+
+    def report(self, results, wall):
+        # 延迟只统计拿到响应的请求，连接失败、超时的耗时没有意义
+        answered = [(record, status, elapsed) for record, status, elapsed in results if status is not None]
+        latencies = [elapsed for _, _, elapsed in answered]
+        recorded = [r['duration_ms'] for r, _, _ in results if 'duration_ms' in r]
+        no_response = len(results) - len(answered)
+        failed = no_response + sum(1 for _, status, _ in answered if status >= 500)
+        mismatched = sum(1 for r, status, _ in answered if status != r.get('status'))
+
+        rate = len(results) / wall if wall > 0 else 0.0
+        self.stdout.write(f'requests:     {len(results)} in {wall:.2f}s ({rate:.1f} req/s)')
+        self.stdout.write(f'errors:       {failed} (no response: {no_response}, '
+                          f'status differs from recording: {mismatched})')
+        if latencies:
+            self.stdout.write(
+                f'latency ms:   p50={percentile(latencies, 50):.1f} p90={percentile(latencies, 90):.1f} '
+                f'p99={percentile(latencies, 99):.1f} max={max(latencies):.1f}')
+        else:
+            self.stdout.write('latency ms:   n/a (no responses)')
+        if recorded:
+            self.stdout.write(f'recorded p50: {statistics.median(recorded):.1f} ms (server side)')
+
+        by_path = {}
+        for record, _, elapsed in answered:
+            by_path.setdefault((record['method'], record['path']), []).append(elapsed)
+        self.stdout.write('')
+        self.stdout.write('slowest endpoints (p90 ms):')
+        ranked = sorted(by_path.items(), key=lambda item: percentile(item[1], 90), reverse=True)
+        for (method, path), values in ranked[:10]:
+            self.stdout.write(f'  {percentile(values, 90):8.1f}  {len(values):6d}  {method} {path}')
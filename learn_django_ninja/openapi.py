@@ -0,0 +1,140 @@
+import gzip
+import hashlib
+import json
+import threading
+from pathlib import Path
+
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.cache import patch_vary_headers
+from ninja.responses import NinjaJSONEncoder
+
+from learn_django_ninja.compression import choose_encoding
+
+try:
+    import brotli
+except ImportError:  # brotli 是可选依赖，没有时只提供 gzip
+    brotli = None
+
+# 服务端优先级：能用 br 就不用 gzip
+ENCODINGS = ('br', 'gzip')
+SUFFIXES = {'br': '.br', 'gzip': '.gz'}
+
+
+def decompress(encoding, data):
+    if encoding == 'gzip':
+        return gzip.decompress(data)
+    if brotli is None:
+        raise ValueError('brotli is not installed')
+    return brotli.decompress(data)
+
+
+def etag_matches(request, etag):
+    header = request.headers.get('If-None-Match')
+    if not header:
+        return False
+    if header.strip() == '*':
+        return True
+    tags = [tag.strip() for tag in header.split(',')]
+    return any(tag.removeprefix('W/') == etag for tag in tags)
+
+
+class OpenAPIDocument:
+    """一份已经序列化好的 OpenAPI 文档及其 gzip / brotli 版本，按内容哈希生成强 ETag"""
+
+    def __init__(self, content, variants=None):
+        self.content = content
+        self.digest = hashlib.sha256(content).hexdigest()
+        self.variants = {'identity': content}
+        self.variants.update(variants or {})
+        if 'gzip' not in self.variants:
+            self.variants['gzip'] = gzip.compress(content, compresslevel=9, mtime=0)
+        if 'br' not in self.variants and brotli is not None:
+            self.variants['br'] = brotli.compress(content, quality=11)
+
+    @classmethod
+    def build(cls, api):
+        schema = api.get_openapi_schema()
+        content = json.dumps(schema, cls=NinjaJSONEncoder, ensure_ascii=False, separators=(',', ':'))
+        return cls(content.encode())
+
+    @classmethod
+    def load(cls, path):
+        """压缩版本只有解压后与文档内容一致时才使用，过期或损坏的重新压缩"""
+        path = Path(path)
+        content = path.read_bytes()
+        variants = {}
+        for encoding, suffix in SUFFIXES.items():
+            compressed = path.with_name(path.name + suffix)
+            if not compressed.exists():
+                continue
+            data = compressed.read_bytes()
+            try:
+                if decompress(encoding, data) == content:
+                    variants[encoding] = data
+            except Exception:
+                pass
+        return cls(content, variants)
+
+    def write(self, path):
+        """写出文档和能生成的压缩版本，删掉这次生成不了的旧压缩文件"""
+        path = Path(path)
+        path.write_bytes(self.content)
+        written = [path]
+        for encoding, suffix in SUFFIXES.items():
+            compressed = path.with_name(path.name + suffix)
+            if encoding in self.variants:
+                compressed.write_bytes(self.variants[encoding])
+                written.append(compressed)
+            else:
+                compressed.unlink(missing_ok=True)
+        return written
+
+    def etag(self, encoding):
+        # 强 ETag 必须区分不同的 Content-Encoding
+        if encoding == 'identity':
+            return f'"{self.digest}"'
+        return f'"{self.digest}-{encoding}"'
+
+    def response(self, request):
+        encodings = [e for e in ENCODINGS if e in self.variants]
+        encoding = choose_encoding(request, encodings) or 'identity'
+        etag = self.etag(encoding)
+
+        if etag_matches(request, etag):
+            response = HttpResponseNotModified()
+        else:
+            response = HttpResponse(self.variants[encoding], content_type='application/json; charset=utf-8')
+            if encoding != 'identity':
+                response['Content-Encoding'] = encoding
+        response['ETag'] = etag
+        response['Cache-Control'] = getattr(settings, 'OPENAPI_CACHE_CONTROL', 'public, max-age=0, must-revalidate')
+        patch_vary_headers(response, ('Accept-Encoding',))
+        return response
+
+
+class PrecomputedOpenAPIView:
+    """
+    替代 ninja 默认的 openapi.json 视图：文档只生成一次（或从 export_openapi 写出的文件加载），
+    之后每次请求直接返回缓存的字节。
+    """
+
+    def __init__(self, api, path=None):
+        self.api = api
+        self.path = path
+        self._document = None
+        self._lock = threading.Lock()
+
+    @property
+    def document(self):
+        if self._document is None:
+            with self._lock:
+                if self._document is None:
+                    if self.path and Path(self.path).exists():
+                        self._document = OpenAPIDocument.load(self.path)
+                    else:
+                        self._document = OpenAPIDocument.build(self.api)
+        return self._document
+
+    def __call__(self, request):
+        return self.document.response(request)
@@ -0,0 +1,307 @@
+import cProfile
+import contextvars
+import functools
+import hmac
+import io
+import marshal
+import pstats
+import random
+import sys
+import threading
+import time
+import uuid
+from collections import Counter, deque
+from typing import List
+
+from django.conf import settings
+from django.db import connection
+from django.http import HttpResponse
+from ninja import Router, Schema
+from ninja.operation import AsyncOperation
+
+PHASES = ('auth', 'parse', 'view', 'db', 'serialize')
+
+_timings = contextvars.ContextVar('profiling_timings', default=None)
+
+
+def setting(name, default):
+    return getattr(settings, f'PROFILING_{name}', default)
+
+
+def allowed(request):
+    """
+    DEBUG、staff 用户，或 PROFILING_HEADER 头的值等于 PROFILING_TOKEN。
+    精简中间件链上的路径没有 request.user，DEBUG 关闭时只能用 token。
+    """
+    if settings.DEBUG or getattr(getattr(request, 'user', None), 'is_staff', False):
+        return True
+    token = setting('TOKEN', None)
+    header = setting('HEADER', 'X-Profile')
+    value = request.headers.get(header, '') if header else ''
+    return bool(token) and hmac.compare_digest(value.encode(), token.encode())
+
+
+class ProfileStore:
+    """只保留最近 N 个 profile 的内存存储"""
+
+    def __init__(self, maxlen):
+        self._profiles = deque(maxlen=maxlen)
+        self._lock = threading.Lock()
+
+    def add(self, profile):
+        with self._lock:
+            self._profiles.append(profile)
+
+    def list(self):
+        with self._lock:
+            return list(reversed(self._profiles))
+
+    def get(self, profile_id):
+        with self._lock:
+            for profile in self._profiles:
+                if profile['id'] == profile_id:
+                    return profile
+        return None
+
+    def clear(self):
+        with self._lock:
+            self._profiles.clear()
+
+
+class StackSampler:
+    """后台线程定时采样正在处理请求的线程调用栈，开销远低于 cProfile"""
+
+    def __init__(self, interval):
+        self.interval = interval
+        self._watched = {}
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def watch(self, ident):
+        samples = Counter()
+        with self._lock:
+            self._watched[ident] = samples
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='profiling-sampler', daemon=True)
+                self._thread.start()
+        return samples
+
+    def unwatch(self, ident):
+        with self._lock:
+            self._watched.pop(ident, None)
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            with self._lock:
+                if not self._watched:
+                    continue
+                frames = sys._current_frames()
+                for ident, samples in self._watched.items():
+                    frame = frames.get(ident)
+                    if frame is not None:
+                        samples[self._collapse(frame)] += 1
+
+    @staticmethod
+    def _collapse(frame):
+        stack = []
+        while frame is not None:
+            code = frame.f_code
+            stack.append(f'{code.co_name} ({code.co_filename}:{frame.f_lineno})')
+            frame = frame.f_back
+        return ';'.join(reversed(stack))
+
+
+class DbTimer:
+    def __call__(self, execute, sql, params, many, context):
+        timings = _timings.get()
+        t0 = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            if timings is not None:
+                timings['db'] += time.perf_counter() - t0
+                timings['queries'] += 1
+
+
+class _Stats:
+    # pstats.Stats 可以从任何带 create_stats() 和 stats 属性的对象加载
+    def __init__(self, stats):
+        self.stats = stats
+
+    def create_stats(self):
+        pass
+
+
+class Profiler:
+    """
+    NinjaAPI 的按需性能分析钩子：
+    - 请求带 PROFILING_HEADER 头（DEBUG、staff 用户或头的值是 PROFILING_TOKEN）或命中 PROFILING_SAMPLE_RATE 时用 cProfile 分析；
+    - 设置了 PROFILING_SLOW_MS 时其余请求用栈采样，超过阈值才保留。
+    """
+
+    def __init__(self):
+        self.store = ProfileStore(setting('MAX_PROFILES', 50))
+        self.sampler = StackSampler(setting('SAMPLE_INTERVAL', 0.005))
+        self.db_timer = DbTimer()
+
+    @property
+    def enabled(self):
+        return setting('ENABLED', False)
+
+    def install(self, api):
+        # LazyNinjaAPI 延迟加载的 router 挂上之后也要包装
+        callbacks = getattr(api, 'router_loaded_callbacks', None)
+        if callbacks is not None and self.install not in callbacks:
+            callbacks.append(self.install)
+        for _, router in api._routers:
+            for path_view in router.path_operations.values():
+                for operation in path_view.operations:
+                    self.wrap(operation)
+
+    def wrap(self, operation):
+        if getattr(operation, '_profiled', False) or isinstance(operation, AsyncOperation):
+            return
+        if operation.view_func.__module__ == __name__:
+            return
+        operation._profiled = True
+        operation._run_checks = self._timed('auth', operation._run_checks)
+        operation._get_values = self._timed('parse', operation._get_values)
+        operation.view_func = self._timed('view', operation.view_func)
+        operation._result_to_response = self._timed('serialize', operation._result_to_response)
+        operation.run = functools.partial(self._run, operation, operation.run)
+
+    def _timed(self, phase, func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            timings = _timings.get()
+            if timings is None:
+                return func(*args, **kwargs)
+            db_before = timings['db']
+            t0 = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                # 各阶段的耗时扣除其中的 SQL 时间，单独记在 db 里
+                timings[phase] += time.perf_counter() - t0 - (timings['db'] - db_before)
+
+        return wrapper
+
+    def trigger(self, request):
+        header = setting('HEADER', 'X-Profile')
+        if header and header in request.headers and allowed(request):
+            return 'header'
+        rate = setting('SAMPLE_RATE', 0.0)
+        if rate and random.random() < rate:
+            return 'sample'
+        if setting('SLOW_MS', None) is not None:
+            return 'slow'
+        return None
+
+    def _run(self, operation, run, request, *args, **kwargs):
+        trigger = self.enabled and self.trigger(request)
+        if not trigger:
+            return run(request, *args, **kwargs)
+
+        timings = dict.fromkeys(PHASES, 0.0)
+        timings['queries'] = 0
+        token = _timings.set(timings)
+        profile = samples = None
+        ident = threading.get_ident()
+        if trigger == 'slow':
+            samples = self.sampler.watch(ident)
+        else:
+            profile = cProfile.Profile()
+
+        t0 = time.perf_counter()
+        try:
+            with connection.execute_wrapper(self.db_timer):
+                if profile is not None:
+                    response = profile.runcall(run, request, *args, **kwargs)
+                else:
+                    response = run(request, *args, **kwargs)
+        finally:
+            total = time.perf_counter() - t0
+            if samples is not None:
+                self.sampler.unwatch(ident)
+            _timings.reset(token)
+
+        if trigger == 'slow' and total * 1000 < setting('SLOW_MS', 0):
+            return response
+
+        if profile is not None:
+            profile.create_stats()
+            kind, data = 'cprofile', marshal.dumps(profile.stats)
+        else:
+            kind = 'sample'
+            data = ''.join(f'{stack} {count}\n' for stack, count in samples.most_common()).encode()
+
+        self.store.add({
+            'id': uuid.uuid4().hex,
+            'created': time.time(),
+            'method': request.method,
+            'path': request.path,
+            'operation': operation.view_func.__name__,
+            'status': response.status_code,
+            'trigger': trigger,
+            'kind': kind,
+            'total_ms': round(total * 1000, 3),
+            'queries': timings.pop('queries'),
+            'phases_ms': {phase: round(value * 1000, 3) for phase, value in timings.items()},
+            'data': data,
+        })
+        return response
+
+
+profiler = Profiler()
+
+router = Router()
+
+
+class ProfileSummary(Schema):
+    id: str
+    created: float
+    method: str
+    path: str
+    operation: str
+    status: int
+    trigger: str
+    kind: str
+    total_ms: float
+    queries: int
+    phases_ms: dict
+
+
+class Error(Schema):
+    message: str
+
+
+@router.get('', response={200: List[ProfileSummary], 403: Error}, include_in_schema=False)
+def list_profiles(request):
+    if not allowed(request):
+        return 403, {'message': 'Profiles are only available to staff users or with PROFILING_TOKEN'}
+    return profiler.store.list()
+
+
+@router.get('/{profile_id}', include_in_schema=False)
+def download_profile(request, profile_id: str, text: bool = False):
+    if not allowed(request):
+        return router.api.create_response(
+            request, {'message': 'Profiles are only available to staff users or with PROFILING_TOKEN'}, status=403)
+    profile = profiler.store.get(profile_id)
+    if profile is None:
+        return router.api.create_response(request, {'message': 'Profile not found'}, status=404)
+
+    if profile['kind'] == 'sample':
+        # 折叠栈格式，可以直接交给 flamegraph.pl / speedscope
+        return HttpResponse(profile['data'], content_type='text/plain; charset=utf-8')
+
+    if text:
+        out = io.StringIO()
+        stats = pstats.Stats(_Stats(marshal.loads(profile['data'])), stream=out)
+        stats.sort_stats('cumulative').print_stats(50)
+        return HttpResponse(out.getvalue(), content_type='text/plain; charset=utf-8')
+
+    response = HttpResponse(profile['data'], content_type='application/octet-stream')
+    response['Content-Disposition'] = f'attachment; filename="{profile["operation"]}-{profile_id}.prof"'
+    return response
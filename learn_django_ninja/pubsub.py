@@ -0,0 +1,154 @@
+import asyncio
+import json
+import threading
+import time
+from collections import deque
+from itertools import islice
+from typing import NamedTuple
+
+from django.core.handlers.asgi import ASGIRequest
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import StreamingHttpResponse
+
+
+class Message(NamedTuple):
+    seq: int
+    id: str
+    event: str
+    data: str
+
+    def encode(self):
+        return f'id: {self.id}\nevent: {self.event}\ndata: {self.data}\n\n'
+
+
+class Broker:
+    """
+    进程内的发布 / 订阅：最近 size 条消息保存在环形缓冲区里，客户端断线重连时带上 Last-Event-ID 补发。
+    消息 id 是 “启动时间-序号”，进程重启或缓冲区已经覆盖掉断线期间的消息时，客户端会收到 reset 事件。
+
+    ASGI 下每个订阅者只是一个挂起的协程，发布时每个事件循环只唤醒一次，与订阅者数量无关；
+    WSGI 下每个订阅者占用一个线程，用 Condition 等待。
+    """
+
+    def __init__(self, size=1000):
+        self.epoch = format(time.time_ns(), 'x')
+        self.buffer = deque(maxlen=size)
+        self.seq = 0
+        self.condition = threading.Condition()
+        self.waiters = {}
+
+    def publish(self, event, data):
+        with self.condition:
+            self.seq += 1
+            message = Message(self.seq, f'{self.epoch}-{self.seq}', event, json.dumps(data, cls=DjangoJSONEncoder))
+            self.buffer.append(message)
+            self.condition.notify_all()
+            waiters, self.waiters = self.waiters, {}
+        for loop, waiter in waiters.items():
+            try:
+                loop.call_soon_threadsafe(waiter.set)
+            except RuntimeError:
+                # 事件循环已经关闭
+                pass
+        return message
+
+    def parse_id(self, last_event_id):
+        """返回 Last-Event-ID 对应的序号；不是本进程发出的 id 返回 None"""
+        epoch, _, seq = (last_event_id or '').partition('-')
+        if epoch != self.epoch or not seq.isdigit() or int(seq) > self.seq:
+            return None
+        return int(seq)
+
+    def after(self, seq):
+        """返回 (序号之后的消息, 当前序号, 是否完整)；缓冲区已经丢掉了一部分时不完整"""
+        with self.condition:
+            oldest = self.buffer[0].seq if self.buffer else self.seq + 1
+            if seq < oldest - 1:
+                return list(self.buffer), self.seq, False
+            # 序号是连续的，新消息就是缓冲区末尾的 self.seq - seq 条，不用扫描整个缓冲区
+            return list(islice(reversed(self.buffer), self.seq - seq))[::-1], self.seq, True
+
+    async def wait(self, seq, timeout):
+        """等到有序号大于 seq 的新消息，超时返回 False"""
+        loop = asyncio.get_running_loop()
+        with self.condition:
+            if self.seq > seq:
+                return True
+            waiter = self.waiters.get(loop)
+            if waiter is None:
+                waiter = self.waiters[loop] = asyncio.Event()
+        try:
+            await asyncio.wait_for(waiter.wait(), timeout)
+        except asyncio.TimeoutError:
+            return False
+        return True
+
+    def wait_sync(self, seq, timeout):
+        with self.condition:
+            return self.condition.wait_for(lambda: self.seq > seq, timeout)
+
+
+def _start(broker, last_event_id):
+    seq = broker.parse_id(last_event_id)
+    if seq is None:
+        # 第一次连接只推送之后的变化；带了无法识别的 id 说明中间可能漏了消息
+        with broker.condition:
+            current = broker.seq
+        return [], current, last_event_id is None
+    return broker.after(seq)
+
+
+def _reset(broker, seq):
+    return f'id: {broker.epoch}-{seq}\nevent: reset\ndata: {{}}\n\n'
+
+
+async def astream(broker, last_event_id, accept, keepalive):
+    messages, seq, complete = _start(broker, last_event_id)
+    yield 'retry: 3000\n\n'
+    while True:
+        if not complete:
+            # 客户端应重新拉取一次完整列表，之后的增量从这里继续
+            yield _reset(broker, seq)
+        else:
+            for message in messages:
+                if accept(message.event):
+                    yield message.encode()
+        if not await broker.wait(seq, keepalive):
+            yield ': keepalive\n\n'
+        messages, seq, complete = broker.after(seq)
+
+
+def stream(broker, last_event_id, accept, keepalive):
+    messages, seq, complete = _start(broker, last_event_id)
+    yield 'retry: 3000\n\n'
+    while True:
+        if not complete:
+            yield _reset(broker, seq)
+        else:
+            for message in messages:
+                if accept(message.event):
+                    yield message.encode()
+        if not broker.wait_sync(seq, keepalive):
+            yield ': keepalive\n\n'
+        messages, seq, complete = broker.after(seq)
+
+
+def event_stream_response(request, broker, topics=None, keepalive=15):
+    """
+    text/event-stream 响应。topics 是要订阅的事件前缀，如 ['employee', 'department.deleted']。
+    ASGI 下用异步生成器，WSGI（runserver、测试客户端）下退回同步生成器。
+    """
+    last_event_id = request.headers.get('Last-Event-ID') or request.GET.get('last_event_id')
+
+    def accept(event):
+        return not topics or any(event == t or event.startswith(t + '.') for t in topics)
+
+    if isinstance(request, ASGIRequest):
+        content = astream(broker, last_event_id, accept, keepalive)
+    else:
+        content = stream(broker, last_event_id, accept, keepalive)
+    response = StreamingHttpResponse(content, content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # 关掉 nginx 的响应缓冲，事件才能立即送到浏览器
+    response['X-Accel-Buffering'] = 'no'
+    return response
@@ -0,0 +1,84 @@
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured, MiddlewareNotUsed
+from django.core.handlers.base import BaseHandler
+from django.core.handlers.exception import convert_exception_to_response
+from django.utils.module_loading import import_string
+
+DEFAULT_LEAN_MIDDLEWARE = [
+    'django.middleware.common.CommonMiddleware',
+    'learn_django_ninja.traffic.TrafficRecorderMiddleware',
+]
+
+
+class MiddlewareStack(BaseHandler):
+    """
+    用一份独立的中间件列表组装出来的处理链，行为与 Django 按 settings.MIDDLEWARE 组装的一致
+    （process_view / process_exception 等钩子只注册到这条链上），只支持同步模式。
+    """
+
+    def __init__(self, middleware):
+        self.middleware = list(middleware)
+        self.load_middleware()
+
+    def load_middleware(self, is_async=False):
+        self._view_middleware = []
+        self._template_response_middleware = []
+        self._exception_middleware = []
+
+        handler = convert_exception_to_response(self._get_response)
+        for middleware_path in reversed(self.middleware):
+            middleware = import_string(middleware_path)
+            try:
+                mw_instance = middleware(handler)
+            except MiddlewareNotUsed:
+                continue
+            if mw_instance is None:
+                raise ImproperlyConfigured(f'Middleware factory {middleware_path} returned None.')
+
+            if hasattr(mw_instance, 'process_view'):
+                self._view_middleware.insert(0, mw_instance.process_view)
+            if hasattr(mw_instance, 'process_template_response'):
+                self._template_response_middleware.append(mw_instance.process_template_response)
+            if hasattr(mw_instance, 'process_exception'):
+                self._exception_middleware.append(mw_instance.process_exception)
+            handler = convert_exception_to_response(mw_instance)
+        self._middleware_chain = handler
+
+    def __call__(self, request):
+        return self._middleware_chain(request)
+
+
+def path_matches(path, patterns):
+    """
+    以 / 结尾的只匹配它下面的子路径；否则匹配这个路径本身以及它下面的子路径，
+    例如 /api/_profiles 同时匹配列表 /api/_profiles 和详情 /api/_profiles/<id>
+    """
+    for pattern in patterns:
+        if pattern.endswith('/'):
+            if path.startswith(pattern):
+                return True
+        elif path == pattern or path.startswith(pattern + '/'):
+            return True
+    return False
+
+
+class RoutedMiddleware:
+    """
+    按路径选择中间件：LEAN_MIDDLEWARE_PATHS 下的无状态接口（Bearer / API Key 认证）只走 LEAN_MIDDLEWARE，
+    跳过 session、CSRF、messages、clickjacking 和 AuthenticationMiddleware；
+    其余路径（admin、依赖 session 的 /api/me 等）照常走 MIDDLEWARE 里排在它后面的完整中间件。
+    """
+
+    def __init__(self, get_response):
+        self.full = get_response
+        self.lean = MiddlewareStack(getattr(settings, 'LEAN_MIDDLEWARE', DEFAULT_LEAN_MIDDLEWARE))
+        self.paths = getattr(settings, 'LEAN_MIDDLEWARE_PATHS', [])
+        self.exclude = getattr(settings, 'LEAN_MIDDLEWARE_EXCLUDE', [])
+
+    def is_lean(self, path):
+        return path_matches(path, self.paths) and not path_matches(path, self.exclude)
+
+    def __call__(self, request):
+        if self.is_lean(request.path_info):
+            return self.lean(request)
+        return self.full(request)
@@ -0,0 +1,157 @@
+import threading
+from bisect import bisect_left, insort
+from collections import Counter, defaultdict
+
+
+class SearchIndex:
+    """
+    内存搜索索引，替代每次请求都 `q in w.lower()` 的全量扫描。
+
+    - 子串搜索：对预先小写化的 key 建 1..ngram 长度的 n-gram 倒排表，
+      查询时只扫描最稀有的那个 gram 的候选集，再用 `in` 校验；
+    - 前缀搜索：按 key 排序的数组 + 二分查找。
+    子串搜索的结果按 items 里的顺序返回，与 `[w for w in items if q in w.lower()]` 一致：
+    add 相当于 list.append，remove 相当于 list.remove（删掉第一个相等的），sync 之后按新列表的顺序；
+    前缀搜索按 key 排序。
+    """
+
+    def __init__(self, items=(), ngram=3):
+        self.ngram = ngram
+        self._items = {}
+        self._keys = {}
+        self._ids = defaultdict(list)
+        self._postings = defaultdict(list)
+        self._sorted = []
+        self._next_id = 0
+        self._stale = 0
+        self._lock = threading.Lock()
+        for item in items:
+            self.add(item)
+
+    def __len__(self):
+        return len(self._items)
+
+    def __iter__(self):
+        return iter(list(self._items.values()))
+
+    @staticmethod
+    def normalize(value):
+        return str(value).lower()
+
+    def _grams(self, key):
+        grams = set()
+        for n in range(1, self.ngram + 1):
+            for i in range(len(key) - n + 1):
+                grams.add(key[i:i + n])
+        return grams
+
+    def add(self, item):
+        with self._lock:
+            item_id = self._next_id
+            self._next_id += 1
+            key = self.normalize(item)
+            self._items[item_id] = item
+            self._keys[item_id] = key
+            self._ids[item].append(item_id)
+            # id 单调递增，倒排表追加后仍然有序
+            for gram in self._grams(key):
+                self._postings[gram].append(item_id)
+            insort(self._sorted, (key, item_id))
+
+    def remove(self, item):
+        with self._lock:
+            ids = self._ids.get(item)
+            if not ids:
+                raise ValueError(f'{item!r} is not in index')
+            item_id = ids.pop(0)
+            if not ids:
+                del self._ids[item]
+            key = self._keys.pop(item_id)
+            del self._items[item_id]
+            del self._sorted[bisect_left(self._sorted, (key, item_id))]
+            # 倒排表里的旧 id 查询时跳过，积累太多再整体压缩
+            self._stale += 1
+            if self._stale > len(self._items):
+                self._compact()
+
+    def sync(self, items):
+        """让索引内容与 items 一致：只为有变化的部分计算 n-gram，然后按 items 的顺序重新编号"""
+        items = list(items)
+        wanted = Counter(items)
+        current = Counter(self._items.values())
+        for item, count in (current - wanted).items():
+            for _ in range(count):
+                self.remove(item)
+        for item, count in (wanted - current).items():
+            for _ in range(count):
+                self.add(item)
+        self._renumber(items)
+
+    def _renumber(self, items):
+        # id 即顺序：新增的元素排在末尾、重复元素删掉的不一定是列表里的那一个，这里按 items 重新分配 id，
+        # 倒排表随之换成新 id 并排序，查询结果和分页就与列表顺序一致
+        with self._lock:
+            queues = {item: iter(ids) for item, ids in self._ids.items()}
+            mapping = {next(queues[item]): new_id for new_id, item in enumerate(items)}
+            self._items = dict(sorted((mapping[i], item) for i, item in self._items.items()))
+            self._keys = {mapping[i]: key for i, key in self._keys.items()}
+            ids = defaultdict(list)
+            for item_id, item in self._items.items():
+                ids[item].append(item_id)
+            self._ids = ids
+            postings = defaultdict(list)
+            for gram, old_ids in self._postings.items():
+                new_ids = sorted(mapping[i] for i in old_ids if i in mapping)
+                if new_ids:
+                    postings[gram] = new_ids
+            self._postings = postings
+            self._sorted = sorted((key, item_id) for item_id, key in self._keys.items())
+            self._next_id = len(items)
+            self._stale = 0
+
+    def _compact(self):
+        alive = self._keys
+        postings = defaultdict(list)
+        for gram, ids in self._postings.items():
+            ids = [i for i in ids if i in alive]
+            if ids:
+                postings[gram] = ids
+        self._postings = postings
+        self._stale = 0
+
+    def _candidates(self, q):
+        if len(q) <= self.ngram:
+            return self._postings.get(q, ())
+        grams = [q[i:i + self.ngram] for i in range(len(q) - self.ngram + 1)]
+        return min((self._postings.get(gram, ()) for gram in grams), key=len)
+
+    def search(self, q, limit=None, offset=0):
+        q = self.normalize(q)
+        offset = max(offset, 0)
+        end = None if limit is None else offset + max(limit, 0)
+        if not q:
+            return list(self._items.values())[offset:end]
+
+        keys = self._keys
+        results = []
+        for item_id in self._candidates(q):
+            key = keys.get(item_id)
+            if key is None or q not in key:
+                continue
+            results.append(item_id)
+            if end is not None and len(results) >= end:
+                break
+        return [self._items[i] for i in results[offset:end] if i in self._items]
+
+    def prefix(self, q, limit=None, offset=0):
+        q = self.normalize(q)
+        offset = max(offset, 0)
+        end = None if limit is None else offset + max(limit, 0)
+        start = bisect_left(self._sorted, (q,))
+        stop = None if end is None else start + end
+        results = []
+        for key, item_id in self._sorted[start:stop]:
+            if not key.startswith(q):
+                break
+            results.append(self._items[item_id])
+        return results[offset:]
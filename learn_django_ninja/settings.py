@@ -37,18 +37,23 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'learn_django_ninja',
     'employee',
     'project',
 ]
 
 MIDDLEWARE = [
+    'learn_django_ninja.log.RequestIdMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'learn_django_ninja.compression.CompressionMiddleware',
+    'learn_django_ninja.routing.RoutedMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'learn_django_ninja.traffic.TrafficRecorderMiddleware',
 ]
 
 ROOT_URLCONF = 'learn_django_ninja.urls'
@@ -124,38 +129,139 @@ STATIC_URL = 'static/'
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# 流量录制，见 learn_django_ninja/traffic.py 和 replay_traffic 命令
+TRAFFIC_RECORD = False
+TRAFFIC_LOG_PATH = BASE_DIR / 'traffic.jsonl'
+TRAFFIC_RECORD_PREFIX = '/api/'
+TRAFFIC_REDACT_PARAMS = ['api_key']
+
+# 按需性能分析，见 learn_django_ninja/profiling.py，结果在 /api/_profiles 下载
+PROFILING_ENABLED = False
+PROFILING_HEADER = 'X-Profile'
+# 精简中间件链上没有 request.user，DEBUG 关闭时需要在 PROFILING_HEADER 头里带上这个 token 才能触发分析
+PROFILING_TOKEN = None
+PROFILING_SAMPLE_RATE = 0.0
+PROFILING_SLOW_MS = None
+PROFILING_SAMPLE_INTERVAL = 0.005
+PROFILING_MAX_PROFILES = 50
+
+# 预先生成的 OpenAPI 文档：只生成一次并缓存 gzip / brotli 版本，
+# 设置 OPENAPI_SCHEMA_PATH 时优先加载 export_openapi 命令写出的文件
+OPENAPI_PRECOMPUTED = True
+OPENAPI_SCHEMA_PATH = None
+OPENAPI_CACHE_CONTROL = 'public, max-age=0, must-revalidate'
+
+# 响应压缩：只压缩 JSON / NDJSON，按 Accept-Encoding 选择 zstd / br / gzip（br、zstd 需要安装 brotli、zstandard）
+COMPRESSION_MIN_SIZE = 1024
+COMPRESSION_STREAM_FLUSH_SIZE = 16 * 1024
+COMPRESSION_LEVELS = {'zstd': 3, 'br': 4, 'gzip': 6}
+
+# /api/batch 一次最多执行的子请求数
+BATCH_MAX_REQUESTS = 20
+
+# 无状态接口只走精简的中间件（RoutedMiddleware），以 / 结尾的表示整个子路径
+LEAN_MIDDLEWARE_PATHS = ['/api/']
+# 依赖 session / cookie 登录态的接口仍然走完整的 MIDDLEWARE；不以 / 结尾的同时匹配路径本身和它的子路径
+LEAN_MIDDLEWARE_EXCLUDE = ['/api/me', '/api/project', '/api/batch', '/api/docs', '/api/_profiles']
+LEAN_MIDDLEWARE = [
+    'django.middleware.common.CommonMiddleware',
+    'learn_django_ninja.traffic.TrafficRecorderMiddleware',
+]
+
+# /api/events 变更事件：环形缓冲区保留的条数（断线重连时可补发的范围）和心跳间隔（秒）
+EVENTS_BUFFER_SIZE = 1000
+EVENTS_KEEPALIVE = 15
+
+# 批量导入：每个事务写入的行数，以及导入结果里最多保留的错误条数
+IMPORT_BATCH_SIZE = 1000
+IMPORT_MAX_ERRORS = 1000
+
+# 上传的文件（Employee.cv 等）放在 media/ 下，不能是项目根目录：gc_blobs 会清理存储目录里的文件
+MEDIA_ROOT = BASE_DIR / 'media'
+MEDIA_URL = 'media/'
+
+STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+    # Employee.cv：按内容摘要存储，相同的文件只存一份
+    'cv': {'BACKEND': 'learn_django_ninja.storage.ContentAddressedStorage'},
+}
+
+# 按内容寻址的文件在这么多秒内被保存过就不删除：复用已有文件的记录可能还没提交
+BLOB_GRACE_PERIOD = 3600
+
+# 上传时顺便计算文件摘要，ContentAddressedStorage 不用再读一遍
+FILE_UPLOAD_HANDLERS = [
+    'learn_django_ninja.storage.HashingMemoryFileUploadHandler',
+    'learn_django_ninja.storage.HashingTemporaryFileUploadHandler',
+]
+
+# 日志：请求线程只入队，由后台线程写出；SQL 只记录超过 LOG_SLOW_SQL_MS 的慢查询
+LOG_LEVEL = 'INFO'
+LOG_SLOW_SQL_MS = 100
+LOG_SLOW_SQL_SAMPLE_RATE = 1.0
+
 LOGGING = {
     'version': 1,
     'disable_existing_loggers': False,
     'formatters': {
-        'simple': {
-            'format': '{asctime} {levelname} {name} {message}',
-            'style': '{',
+        'json': {
+            '()': 'learn_django_ninja.log.JsonFormatter',
+        },
+    },
+    'filters': {
+        'request_id': {
+            '()': 'learn_django_ninja.log.RequestIdFilter',
         },
     },
     'handlers': {
         # 项目日志{@class=h5 text-secondary mb-4}
         'dbloger-handler': {
             'level': 'DEBUG',
-            'class': 'logging.StreamHandler',
-            'formatter': 'simple',
+            'class': 'learn_django_ninja.log.QueueingHandler',
+            'formatter': 'json',
+            'filters': ['request_id'],
         },
         # 数据库日志{@class=h5 text-secondary mb-4}
         'db-handler': {
             'level': 'DEBUG',
-            'class': 'logging.StreamHandler',
-            'formatter': 'simple',
+            'class': 'learn_django_ninja.log.QueueingHandler',
+            'formatter': 'json',
+            'filters': ['request_id'],
         }
     },
     'loggers': {
+        # 根 logger 也挂着 dbloger-handler，不再向上传播，避免同一条日志写两次
         'dbloger': {
             'level': 'INFO',
             'handlers': ['dbloger-handler'],
-            'propagate': True,
+            'propagate': False,
         },
-        'django.db.backends': {
-            'level': 'DEBUG',
-            'handlers': ['db-handler']
+        # 4xx / 5xx 的请求日志同样异步写出并带上 request id
+        'django.request': {
+            'level': 'WARNING',
+            'handlers': ['dbloger-handler'],
+            'propagate': False,
         },
-    }
+        'learn_django_ninja': {
+            'level': LOG_LEVEL,
+            'handlers': ['dbloger-handler'],
+            'propagate': False,
+        },
+        'employee': {
+            'level': LOG_LEVEL,
+            'handlers': ['dbloger-handler'],
+            'propagate': False,
+        },
+        # 慢 SQL 由 learn_django_ninja.log.SlowQueryLogger 计时后写出，见 LOG_SLOW_SQL_MS
+        'learn_django_ninja.sql': {
+            'level': 'WARNING',
+            'handlers': ['db-handler'],
+            'propagate': False,
+        },
+    },
+    'root': {
+        'level': 'WARNING',
+        'handlers': ['dbloger-handler'],
+    },
 }
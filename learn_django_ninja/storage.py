@@ -0,0 +1,193 @@
+import hashlib
+import os
+import posixpath
+import re
+import tempfile
+import time
+from contextlib import contextmanager
+
+from django.apps import apps
+from django.conf import settings
+from django.core.files import File, locks
+from django.core.files.storage import FileSystemStorage
+from django.core.files.uploadhandler import MemoryFileUploadHandler, TemporaryFileUploadHandler
+from django.db import models, transaction
+from django.utils.deconstruct import deconstructible
+
+HASH_ALGORITHM = 'sha256'
+
+# <目录>/<摘要前两位>/<摘要><扩展名>，只有这样的文件才会被 collect() / gc_blobs 删除
+# 写入中的临时文件，和 blob 在同一个目录里，写完再改名成 blob
+TEMP_PREFIX = '.tmp-'
+
+BLOB_RE = re.compile(r'^(?:[^/]+/)*([0-9a-f]{2})/\1[0-9a-f]{62}(?:\.[a-z0-9]+)?$')
+
+
+class HashingUploadHandlerMixin:
+    """上传时边接收边计算摘要，存到 file.content_digest，存储时不必再读一遍文件"""
+
+    def new_file(self, *args, **kwargs):
+        # MemoryFileUploadHandler.new_file 会抛出 StopFutureHandlers，要先初始化
+        self.hasher = hashlib.new(HASH_ALGORITHM)
+        super().new_file(*args, **kwargs)
+
+    def receive_data_chunk(self, raw_data, start):
+        data = super().receive_data_chunk(raw_data, start)
+        # 返回 None 表示这个 handler 接收了这块数据；没接收的交给下一个 handler 计算
+        if data is None:
+            self.hasher.update(raw_data)
+        return data
+
+    def file_complete(self, file_size):
+        file = super().file_complete(file_size)
+        if file is not None:
+            file.content_digest = self.hasher.hexdigest()
+        return file
+
+
+class HashingMemoryFileUploadHandler(HashingUploadHandlerMixin, MemoryFileUploadHandler):
+    pass
+
+
+class HashingTemporaryFileUploadHandler(HashingUploadHandlerMixin, TemporaryFileUploadHandler):
+    pass
+
+
+def file_digest(content):
+    digest = getattr(content, 'content_digest', None)
+    if digest:
+        return digest
+    hasher = hashlib.new(HASH_ALGORITHM)
+    for chunk in content.chunks():
+        hasher.update(chunk)
+    content.seek(0)
+    return hasher.hexdigest()
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    按内容寻址的文件存储：文件名是内容的摘要（保留原来的目录和扩展名），如 cv/3f/3fa9…e1.pdf。
+    内容相同的文件只存一份，已经存在时直接返回已有的文件名，不再写盘，只更新修改时间；
+    不再被任何记录引用、且超过 BLOB_GRACE_PERIOD 没有被保存过的文件由 collect() 删除，见 reference_count()。
+    """
+
+    @contextmanager
+    def _lock(self):
+        """跨进程的文件锁，让“已存在就复用”和“没有引用就删除”不会交错执行"""
+        os.makedirs(self.location, exist_ok=True)
+        with open(os.path.join(self.location, '.blobs.lock'), 'ab') as f:
+            locks.lock(f, locks.LOCK_EX)
+            try:
+                yield
+            finally:
+                locks.unlock(f)
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        name = self.blob_name(name, file_digest(content))
+        with self._lock():
+            if self._touch(name):
+                return name
+        # 先完整写到同目录的临时文件，再在锁里改名：写到一半失败不会留下内容不对的 blob，
+        # 并发保存同样内容的请求也不会拿到还没写完的文件
+        temp = self._write_temp(name, content)
+        try:
+            with self._lock():
+                if not self._touch(name):
+                    os.replace(temp, self.path(name))
+                    temp = None
+        finally:
+            if temp is not None:
+                os.remove(temp)
+        return name
+
+    def _touch(self, name):
+        """name 已存在时更新修改时间并返回 True；调用方需要持有 _lock()"""
+        if not self.exists(name):
+            return False
+        # 引用它的记录可能还没提交，重新开始宽限期，collect() 不会在这期间删掉它
+        os.utime(self.path(name))
+        return True
+
+    def _write_temp(self, name, content):
+        directory = os.path.dirname(self.path(name))
+        if self.directory_permissions_mode is not None:
+            # 与 FileSystemStorage._save 一样，makedirs 的 mode 受 umask 影响，临时清掉 umask
+            old_umask = os.umask(0o777 & ~self.directory_permissions_mode)
+            try:
+                os.makedirs(directory, self.directory_permissions_mode, exist_ok=True)
+            finally:
+                os.umask(old_umask)
+        else:
+            os.makedirs(directory, exist_ok=True)
+        fd, temp = tempfile.mkstemp(dir=directory, prefix=TEMP_PREFIX)
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                for chunk in content.chunks():
+                    f.write(chunk)
+            if self.file_permissions_mode is not None:
+                os.chmod(temp, self.file_permissions_mode)
+        except BaseException:
+            os.remove(temp)
+            raise
+        return temp
+
+    @staticmethod
+    def blob_name(name, digest):
+        dirname, filename = posixpath.split(name.replace('\\', '/'))
+        ext = os.path.splitext(filename)[1].lower()
+        return posixpath.join(dirname, digest[:2], digest + ext)
+
+    @staticmethod
+    def is_blob_name(name):
+        return bool(BLOB_RE.match(name))
+
+    @staticmethod
+    def is_temp_name(name):
+        return posixpath.basename(name).startswith(TEMP_PREFIX)
+
+    def collect(self, name, grace=None, dry_run=False):
+        """
+        name 没有被引用、且超过 grace 秒没有被保存过时删除，返回是否（应当）删除。
+        进程中途退出留下的临时文件超过 grace 秒也一并删除。
+        """
+        if grace is None:
+            grace = getattr(settings, 'BLOB_GRACE_PERIOD', 3600)
+        temp = self.is_temp_name(name)
+        if not temp and not self.is_blob_name(name):
+            return False
+        with self._lock():
+            if not self.exists(name) or self.get_modified_time(name).timestamp() > time.time() - grace:
+                return False
+            if not temp and reference_count(self, name):
+                return False
+            if not dry_run:
+                self.delete(name)
+        return True
+
+
+def file_fields(storage):
+    """所有使用这个 storage 的 (模型, FileField)"""
+    for model in apps.get_models():
+        for field in model._meta.concrete_fields:
+            if isinstance(field, models.FileField) and field.storage is storage:
+                yield model, field
+
+
+def reference_count(storage, name):
+    """引用计数直接按数据库里指向这个文件的记录数计算，不会因为异常或并发和实际引用不一致"""
+    return sum(model._default_manager.filter(**{field.name: name}).count() for model, field in file_fields(storage))
+
+
+def release(storage, name):
+    """
+    一条记录不再引用 name（被删除或换了文件）；事务提交后没有其他引用就删掉文件。
+    宽限期内刚保存过的文件先留着，由 gc_blobs 命令之后清理。
+    """
+    if not name or not isinstance(storage, ContentAddressedStorage):
+        return
+    transaction.on_commit(lambda: storage.collect(name))
@@ -0,0 +1,588 @@
+import gzip
+import inspect
+import io
+import json
+import logging
+import marshal
+import os
+import random
+import shutil
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+from pathlib import Path
+
+import pydantic
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+
+from learn_django_ninja import api
+from learn_django_ninja.compression import CompressionMiddleware, choose_encoding
+from learn_django_ninja.log import JsonFormatter, QueueingHandler, RequestIdFilter
+from learn_django_ninja.openapi import OpenAPIDocument, decompress
+from learn_django_ninja.profiling import PHASES, profiler
+from learn_django_ninja.pubsub import Broker, stream
+from learn_django_ninja.routing import RoutedMiddleware
+from learn_django_ninja.search import SearchIndex
+from learn_django_ninja.validation import FieldErrors, get_validator
+
+
+def pydantic_result(model, data):
+    try:
+        return model(**data).dict(), None
+    except pydantic.ValidationError as e:
+        return None, [dict(i) for i in e.errors()]
+
+
+def compiled_result(model, data):
+    try:
+        return get_validator(model).validate(data).dict(), None
+    except FieldErrors as e:
+        return None, e.errors
+
+
+class ValidationParityMixin:
+    """compiled 引擎的结果（值和完整的错误信息）必须与 pydantic 完全一致"""
+
+    model = None
+    cases = []
+
+    def test_parity(self):
+        for data in self.cases:
+            with self.subTest(data=data):
+                expected_value, expected_errors = pydantic_result(self.model, data)
+                value, errors = compiled_result(self.model, data)
+                self.assertEqual(value, expected_value)
+                if expected_value is not None:
+                    self.assertEqual(list(value), list(expected_value))
+                # 错误要整条一致：loc、msg、type 和 ctx
+                self.assertEqual(errors, expected_errors)
+
+
+class ItemParityTest(ValidationParityMixin, SimpleTestCase):
+    # api.Item 被后面的表单版本覆盖，这里取 create() 参数上的那个
+    model = inspect.signature(api.create).parameters['item'].annotation
+    cases = [
+        {'name': 'a', 'price': 1.5, 'quantity': 2},
+        {'name': 'a', 'description': 'd', 'price': '1.5', 'quantity': '2'},
+        {'name': 1, 'price': 1, 'quantity': 2.0},
+        {'name': 'a', 'description': None, 'price': 1, 'quantity': 1},
+        {},
+        {'name': 'a', 'price': 'x', 'quantity': 'y'},
+        {'name': None, 'price': None, 'quantity': 1},
+        {'name': 'a', 'price': 1, 'quantity': 1.5},
+        {'name': 'a', 'price': 1, 'quantity': 1, 'extra': True},
+    ]
+
+
+class FormItemParityTest(ValidationParityMixin, SimpleTestCase):
+    model = api.Item
+    cases = [
+        {'name': 'a'},
+        {'name': 'a', 'price': '', 'quantity': '', 'in_stock': ''},
+        {'name': 'a', 'price': '2.5', 'quantity': '3', 'in_stock': 'false'},
+        {'name': 'a', 'price': 'x', 'quantity': '1.5', 'in_stock': 'maybe'},
+        {'price': ''},
+    ]
+
+
+class BatchTest(TestCase):
+    def batch(self, *requests, parallel=False):
+        response = self.client.post(
+            '/api/batch', {'requests': list(requests), 'parallel': parallel}, content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_failed_sub_request_does_not_lose_other_results(self):
+        from employee.models import Department, Employee
+
+        department = Department.objects.create(title='D')
+        employee = Employee.objects.create(first_name='a', last_name='b', department=department)
+        with self.assertLogs('learn_django_ninja.batch', 'ERROR'):
+            results = self.batch(
+                {'method': 'DELETE', 'path': f'/employees/{employee.id}'},
+                # project 的 task_list 签名里缺少 project_id，调用时会抛 TypeError
+                {'path': '/project/1/tasks/'},
+                {'path': '/employees'},
+            )
+        self.assertEqual([r['status'] for r in results], [200, 500, 200])
+        self.assertEqual(results[1]['body'], {'detail': 'Internal Server Error'})
+        self.assertEqual(results[2]['body'], [])
+        self.assertFalse(Employee.objects.exists())
+
+    def test_not_found(self):
+        results = self.batch({'path': '/nope'})
+        self.assertEqual(results[0]['status'], 404)
+
+    def test_streaming_is_not_batchable(self):
+        results = self.batch({'path': '/events'})
+        self.assertEqual(results[0], {'status': 400, 'headers': {}, 'body': {'detail': '/events is not batchable'}})
+
+    def test_parallel(self):
+        results = self.batch(
+            *[{'path': '/math', 'query': {'a': i, 'b': 2}} for i in range(5)],
+            {'method': 'POST', 'path': '/hello', 'body': {'name': 'batch'}},
+            {'path': '/math', 'query': {'a': 1, 'b': 1}},
+            parallel=True,
+        )
+        self.assertEqual([r['status'] for r in results], [200] * 7)
+        self.assertEqual([r['body']['add'] for r in results[:5]], [2, 3, 4, 5, 6])
+        self.assertEqual(results[5]['body'], 'Helo batch')
+        self.assertEqual(results[6]['body'], {'add': 2, 'multiply': 1})
+
+    def test_sub_requests_use_outer_user(self):
+        self.assertEqual(self.batch({'path': '/me'})[0]['status'], 403)
+        self.client.force_login(User.objects.create_user('alice'))
+        results = self.batch({'path': '/me'}, {'path': '/me'}, parallel=True)
+        self.assertEqual([r['status'] for r in results], [200, 200])
+        self.assertEqual(results[0]['body']['username'], 'alice')
+
+
+class RoutingTest(TestCase):
+    def setUp(self):
+        self.routed = RoutedMiddleware(lambda request: None)
+
+    def test_excluded_paths_use_full_stack(self):
+        for pattern in settings.LEAN_MIDDLEWARE_EXCLUDE:
+            base = pattern.rstrip('/')
+            for path in (base, base + '/', base + '/1', base + '/1/tasks/'):
+                with self.subTest(path=path):
+                    self.assertFalse(self.routed.is_lean(path))
+
+    def test_stateless_paths_use_lean_stack(self):
+        for path in ('/api/employees', '/api/employees/1', '/api/math', '/api/items', '/api/melon', '/api/projects'):
+            with self.subTest(path=path):
+                self.assertTrue(self.routed.is_lean(path))
+        for path in ('/admin/', '/'):
+            with self.subTest(path=path):
+                self.assertFalse(self.routed.is_lean(path))
+
+    def test_session_user_on_excluded_path(self):
+        self.client.force_login(User.objects.create_user('staff', is_staff=True))
+        self.assertEqual(self.client.get('/api/me').status_code, 200)
+        self.assertEqual(self.client.get('/api/_profiles').status_code, 200)
+
+
+@override_settings(PROFILING_ENABLED=True, PROFILING_TOKEN='secret')
+class ProfilingTest(TestCase):
+    def setUp(self):
+        profiler.store.clear()
+        self.addCleanup(profiler.store.clear)
+
+    def profile(self):
+        response = self.client.get('/api/employees', HTTP_X_PROFILE='secret')
+        self.assertEqual(response.status_code, 200)
+        return profiler.store.list()[0]
+
+    def test_access_control(self):
+        profile = self.profile()
+        for path in ('/api/_profiles', f'/api/_profiles/{profile["id"]}'):
+            with self.subTest(path=path), self.assertLogs('django.request', 'WARNING'):
+                self.assertEqual(self.client.get(path).status_code, 403)
+                self.assertEqual(self.client.get(path, HTTP_X_PROFILE='wrong').status_code, 403)
+                self.assertEqual(self.client.get(path, HTTP_X_PROFILE='secret').status_code, 200)
+                with override_settings(PROFILING_TOKEN=None):
+                    self.assertEqual(self.client.get(path, HTTP_X_PROFILE='').status_code, 403)
+        # 精简中间件链上没有 request.user，staff 只能在排除的路径上通过 session 认证
+        self.client.force_login(User.objects.create_user('staff', is_staff=True))
+        self.assertEqual(self.client.get('/api/_profiles').status_code, 200)
+        self.client.force_login(User.objects.create_user('user'))
+        with self.assertLogs('django.request', 'WARNING'):
+            self.assertEqual(self.client.get('/api/_profiles').status_code, 403)
+
+    def test_header_trigger(self):
+        self.client.get('/api/employees', HTTP_X_PROFILE='wrong')
+        self.client.get('/api/employees')
+        self.assertEqual(profiler.store.list(), [])
+        profile = self.profile()
+        self.assertEqual((profile['trigger'], profile['kind']), ('header', 'cprofile'))
+        self.assertEqual((profile['path'], profile['operation'], profile['status']),
+                         ('/api/employees', 'list_employees', 200))
+        self.assertEqual(set(profile['phases_ms']), set(PHASES))
+        self.assertGreater(profile['phases_ms']['view'] + profile['phases_ms']['serialize'], 0)
+        self.assertGreater(profile['queries'], 0)
+        self.assertGreater(profile['phases_ms']['db'], 0)
+        self.assertLessEqual(sum(profile['phases_ms'].values()), profile['total_ms'])
+        with override_settings(PROFILING_ENABLED=False):
+            self.client.get('/api/employees', HTTP_X_PROFILE='secret')
+        self.assertEqual(len(profiler.store.list()), 1)
+
+    def test_slow_trigger(self):
+        with override_settings(PROFILING_SLOW_MS=60_000):
+            self.client.get('/api/employees')
+        self.assertEqual(profiler.store.list(), [])
+        with override_settings(PROFILING_SLOW_MS=0):
+            self.client.get('/api/employees')
+        profile = profiler.store.list()[0]
+        self.assertEqual((profile['trigger'], profile['kind']), ('slow', 'sample'))
+        response = self.client.get(f'/api/_profiles/{profile["id"]}', HTTP_X_PROFILE='secret')
+        self.assertEqual(response['Content-Type'], 'text/plain; charset=utf-8')
+        self.assertEqual(response.content, profile['data'])
+
+    def test_download(self):
+        profile = self.profile()
+        listed = self.client.get('/api/_profiles', HTTP_X_PROFILE='secret').json()
+        self.assertEqual([p['id'] for p in listed], [profile['id']])
+        self.assertNotIn('data', listed[0])
+
+        response = self.client.get(f'/api/_profiles/{profile["id"]}', HTTP_X_PROFILE='secret')
+        self.assertEqual(response['Content-Type'], 'application/octet-stream')
+        self.assertIn('list_employees', response['Content-Disposition'])
+        stats = marshal.loads(response.content)
+        self.assertTrue(any(name == 'list_employees' for _, _, name in stats))
+
+        response = self.client.get(f'/api/_profiles/{profile["id"]}?text=true', HTTP_X_PROFILE='secret')
+        self.assertIn(b'list_employees', response.content)
+        self.assertIn(b'cumulative', response.content)
+        with self.assertLogs('django.request', 'WARNING'):
+            response = self.client.get('/api/_profiles/nope', HTTP_X_PROFILE='secret')
+        self.assertEqual(response.status_code, 404)
+
+
+class LazyRouterTest(TestCase):
+    def test_operation_ids_match_baseline(self):
+        """employee 的接口搬到 employee/api.py 之后，已发布的 path 和 operationId 不能变"""
+        with open(Path(__file__).parent / 'testdata' / 'openapi_operation_ids.json') as f:
+            baseline = json.load(f)
+        schema = self.client.get('/api/openapi.json').json()
+        current = {path: {method: op['operationId'] for method, op in item.items()}
+                   for path, item in schema['paths'].items()}
+        self.assertEqual({path: current.get(path) for path in baseline}, baseline)
+
+    def test_lazy_routes_resolve(self):
+        self.assertEqual(self.client.get('/api/employees').status_code, 200)
+        self.assertEqual(self.client.get('/api/list_employees').status_code, 200)
+        self.assertEqual(self.client.get('/api/nope').status_code, 404)
+        self.assertEqual(api.api.pending_routers, [])
+
+    def test_append_slash_redirect(self):
+        response = self.client.get('/api/project/1/tasks?x=1')
+        self.assertEqual(response.status_code, 301)
+        self.assertEqual(response['Location'], '/api/project/1/tasks/?x=1')
+        self.assertEqual(self.client.post('/api/project/1/tasks').status_code, 404)
+
+
+class SearchIndexTest(SimpleTestCase):
+    """结果和分页必须与原来 /weapons 的 `[w for w in weapons if q in w.lower()]` 完全一致"""
+
+    words = ['Ninjato', 'Shuriken', 'Katana', 'Kama', 'Kunai', 'Naginata', 'Yari', 'kat', 'an', 'Katana']
+
+    def assertMatchesNaive(self, index, items):
+        for q in ('', 'a', 'k', 'an', 'ka', 'kat', 'ata', 'nat', 'ninja', 'x', 'katana'):
+            expected = [w for w in items if q in w.lower()]
+            for offset, limit in ((0, None), (0, 2), (1, 2), (3, 10)):
+                end = None if limit is None else offset + limit
+                self.assertEqual(index.search(q, limit=limit, offset=offset), expected[offset:end], (q, offset, limit))
+            self.assertEqual(index.prefix(q), sorted((w for w in items if w.lower().startswith(q)), key=str.lower))
+
+    def test_matches_naive_filter(self):
+        self.assertMatchesNaive(SearchIndex(self.words), self.words)
+
+    def test_matches_naive_filter_after_mutations(self):
+        rng = random.Random(0)
+        items = list(self.words)
+        index = SearchIndex(items)
+        for _ in range(300):
+            op = rng.random()
+            if op < 0.3:
+                word = rng.choice(self.words)
+                items.append(word)
+                index.add(word)
+            elif op < 0.6 and items:
+                word = rng.choice(items)
+                items.remove(word)
+                index.remove(word)
+            else:
+                items = [rng.choice(self.words) for _ in range(rng.randint(0, 12))] if op > 0.9 else items
+                rng.shuffle(items)
+                if rng.random() < 0.5 and items:
+                    items.insert(rng.randrange(len(items)), rng.choice(self.words))
+                index.sync(items)
+            self.assertMatchesNaive(index, items)
+            self.assertEqual(list(index), items)
+
+
+class ReplayHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path == '/ok':
+            self.send_response(200)
+            self.end_headers()
+            self.wfile.write(b'ok')
+        elif self.path == '/fail':
+            self.send_response(500)
+            self.end_headers()
+        elif self.path == '/reset':
+            # 不返回任何响应直接断开，客户端得到 RemoteDisconnected（不是 URLError）
+            self.close_connection = True
+        elif self.path == '/slow':
+            time.sleep(1)
+
+    def log_message(self, *args):
+        pass
+
+
+class ReplayTrafficTest(SimpleTestCase):
+    def setUp(self):
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), ReplayHandler)
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+        self.base_url = f'http://127.0.0.1:{self.server.server_port}'
+
+    def replay(self, paths, base_url=None):
+        fd, path = tempfile.mkstemp(suffix='.jsonl')
+        self.addCleanup(os.remove, path)
+        with os.fdopen(fd, 'w') as f:
+            for i, p in enumerate(paths):
+                f.write(json.dumps({'ts': i, 'method': 'GET', 'path': p, 'status': 200, 'duration_ms': 1}) + '\n')
+        out = io.StringIO()
+        call_command('replay_traffic', file=path, base_url=base_url or self.base_url, speedup=0, timeout=0.2,
+                     stdout=out)
+        return out.getvalue()
+
+    def test_network_errors_are_counted(self):
+        out = self.replay(['/ok', '/fail', '/reset', '/slow'])
+        self.assertIn('requests:     4 ', out)
+        self.assertIn('errors:       3 (no response: 2, status differs from recording: 1)', out)
+        self.assertIn('p50=', out)
+
+    def test_all_requests_fail(self):
+        out = self.replay(['/reset', '/reset'])
+        self.assertIn('errors:       2 (no response: 2', out)
+        self.assertIn('latency ms:   n/a', out)
+
+
+class OpenAPIDocumentTest(SimpleTestCase):
+    def setUp(self):
+        self.factory = RequestFactory()
+        self.document = OpenAPIDocument(b'{"openapi": "3.0.2", "paths": {}}' * 20)
+
+    def get(self, **headers):
+        return self.document.response(self.factory.get('/api/openapi.json', **headers))
+
+    def test_negotiates_compressed_variants(self):
+        for accept, encoding in (('gzip', 'gzip'), ('br, gzip', 'br'), ('gzip;q=0, *', 'br'), ('', 'identity'),
+                                 ('br;q=0, gzip;q=0', 'identity')):
+            with self.subTest(accept=accept):
+                response = self.get(HTTP_ACCEPT_ENCODING=accept)
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response.get('Content-Encoding', 'identity'), encoding)
+                self.assertIn('Accept-Encoding', response['Vary'])
+                body = response.content if encoding == 'identity' else decompress(encoding, response.content)
+                self.assertEqual(body, self.document.content)
+                self.assertEqual(response['ETag'], self.document.etag(encoding))
+
+    def test_not_modified(self):
+        etag = self.get(HTTP_ACCEPT_ENCODING='gzip')['ETag']
+        response = self.get(HTTP_ACCEPT_ENCODING='gzip', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+        self.assertEqual(self.get(HTTP_ACCEPT_ENCODING='gzip', HTTP_IF_NONE_MATCH='W/' + etag).status_code, 304)
+        # 不同编码的 ETag 不同，拿 gzip 的 ETag 请求原文不能 304
+        self.assertEqual(self.get(HTTP_IF_NONE_MATCH=etag).status_code, 200)
+        self.assertEqual(self.get(HTTP_ACCEPT_ENCODING='gzip', HTTP_IF_NONE_MATCH='"other"').status_code, 200)
+
+    def test_served_by_api(self):
+        response = self.client.get('/api/openapi.json', HTTP_ACCEPT_ENCODING='gzip;q=1, br;q=0')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn('paths', json.loads(gzip.decompress(response.content)))
+        self.assertEqual(self.client.get('/api/openapi.json', HTTP_IF_NONE_MATCH=response['ETag'],
+                                         HTTP_ACCEPT_ENCODING='gzip').status_code, 304)
+
+    def test_write_removes_variants_it_cannot_produce(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        path = os.path.join(directory, 'openapi.json')
+        self.document.write(path)
+        self.assertTrue(os.path.exists(path + '.br'))
+        with mock.patch('learn_django_ninja.openapi.brotli', None):
+            OpenAPIDocument(b'{"new": true}').write(path)
+        self.assertFalse(os.path.exists(path + '.br'))
+        self.assertTrue(os.path.exists(path + '.gz'))
+
+    def test_load_ignores_stale_variants(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        path = os.path.join(directory, 'openapi.json')
+        self.document.write(path)
+        # 只替换了原文，旁边的 .gz / .br 还是旧文档的
+        with open(path, 'wb') as f:
+            f.write(b'{"new": true}')
+        with open(path + '.gz', 'wb') as f:
+            f.write(b'not gzip')
+        loaded = OpenAPIDocument.load(path)
+        for encoding in ('gzip', 'br'):
+            self.assertEqual(decompress(encoding, loaded.variants[encoding]), b'{"new": true}')
+
+
+class LoggingTest(TestCase):
+    def handler(self):
+        stream = io.StringIO()
+        handler = QueueingHandler(stream)
+        handler.setFormatter(JsonFormatter())
+        handler.addFilter(RequestIdFilter())
+        return handler, stream
+
+    def test_listener_starts_on_first_record(self):
+        handler, stream = self.handler()
+        self.assertIsNone(handler.listener._thread)
+        handler.handle(logging.makeLogRecord({'msg': 'hello %s', 'args': ('world',), 'levelno': logging.INFO}))
+        self.assertIsNotNone(handler.listener._thread)
+        handler.close()
+        self.assertEqual(json.loads(stream.getvalue())['message'], 'hello world')
+
+    def test_request_logs_go_through_queue_with_request_id(self):
+        for name in ('django.request', ''):
+            with self.subTest(logger=name):
+                handlers = logging.getLogger(name).handlers
+                self.assertTrue(any(isinstance(h, QueueingHandler) for h in handlers))
+
+        handler, stream = self.handler()
+        logger = logging.getLogger('django.request')
+        logger.addHandler(handler)
+        try:
+            self.client.get('/api/nope', HTTP_X_REQUEST_ID='req-1')
+        finally:
+            logger.removeHandler(handler)
+            handler.close()
+        record = json.loads(stream.getvalue().splitlines()[0])
+        self.assertEqual((record['logger'], record['request_id'], record['status_code']), ('django.request', 'req-1', 404))
+
+
+class BrokerTest(SimpleTestCase):
+    def publish(self, broker, count):
+        return [broker.publish('employee.updated', {'id': i}) for i in range(count)]
+
+    def test_ring_buffer_keeps_latest(self):
+        broker = Broker(size=3)
+        messages = self.publish(broker, 5)
+        self.assertEqual(list(broker.buffer), messages[2:])
+        self.assertEqual(messages[-1].id, f'{broker.epoch}-5')
+
+    def test_resume_after_last_event_id(self):
+        broker = Broker(size=3)
+        messages = self.publish(broker, 5)
+        for last in (2, 3, 4, 5):
+            with self.subTest(last=last):
+                seq = broker.parse_id(messages[last - 1].id)
+                self.assertEqual(broker.after(seq), (messages[last:], 5, True))
+
+    def test_reset_when_id_is_not_in_buffer(self):
+        broker = Broker(size=3)
+        messages = self.publish(broker, 5)
+        # 第 1 条之后的消息有一部分已经被覆盖
+        self.assertEqual(broker.after(broker.parse_id(messages[0].id)), (messages[2:], 5, False))
+        # 别的进程 / 重启之前的 id、未来的 id、乱写的 id 都无法识别
+        for last_event_id in (f'0-{messages[-1].seq}', f'{broker.epoch}-6', 'x', ''):
+            with self.subTest(last_event_id=last_event_id):
+                self.assertIsNone(broker.parse_id(last_event_id))
+
+    def test_stream(self):
+        broker = Broker(size=3)
+        messages = self.publish(broker, 5)
+        chunks = stream(broker, messages[3].id, bool, keepalive=0.01)
+        self.assertEqual(next(chunks), 'retry: 3000\n\n')
+        self.assertEqual(next(chunks), messages[4].encode())
+        self.assertEqual(next(chunks), ': keepalive\n\n')
+        chunks.close()
+
+        chunks = stream(broker, messages[0].id, bool, keepalive=0.01)
+        next(chunks)
+        self.assertEqual(next(chunks), f'id: {broker.epoch}-5\nevent: reset\ndata: {{}}\n\n')
+        # reset 之后从当前序号继续推送新消息
+        message = broker.publish('department.deleted', {'id': 1})
+        self.assertEqual(next(chunks), message.encode())
+        chunks.close()
+
+        # 第一次连接（没有 Last-Event-ID）只推送之后的消息，不发 reset
+        chunks = stream(broker, None, bool, keepalive=0.01)
+        next(chunks)
+        self.assertEqual(next(chunks), ': keepalive\n\n')
+        chunks.close()
+
+
+class CompressionTest(SimpleTestCase):
+    body = b'{"items": [' + b'{"name": "katana", "price": 1.0},' * 100 + b'{}]}'
+
+    def setUp(self):
+        self.factory = RequestFactory()
+
+    def choose(self, accept, encodings=('zstd', 'br', 'gzip')):
+        return choose_encoding(self.factory.get('/', HTTP_ACCEPT_ENCODING=accept), list(encodings))
+
+    def test_negotiation(self):
+        cases = [
+            ('gzip', 'gzip'),
+            ('gzip, br, zstd', 'zstd'),
+            ('gzip, br', 'br'),
+            ('gzip;q=0', None),
+            ('gzip;q=0, *', 'zstd'),
+            ('*;q=0, gzip', 'gzip'),
+            ('*', 'zstd'),
+            ('*;q=0', None),
+            ('identity', None),
+            ('', None),
+            ('GZIP;Q=0.5', 'gzip'),
+            ('gzip;q=x', None),
+        ]
+        for accept, expected in cases:
+            with self.subTest(accept=accept):
+                self.assertEqual(self.choose(accept), expected)
+        self.assertEqual(self.choose('br;q=0, *', ('br', 'gzip')), 'gzip')
+
+    def process(self, response, accept='gzip', **settings):
+        with override_settings(**settings):
+            middleware = CompressionMiddleware(lambda request: response)
+        return middleware(self.factory.get('/api/x', HTTP_ACCEPT_ENCODING=accept))
+
+    def test_compresses_json(self):
+        response = self.process(HttpResponse(self.body, content_type='application/json'),
+                                COMPRESSION_ENCODINGS=['gzip'])
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(response.content), self.body)
+        self.assertEqual(response['Content-Length'], str(len(response.content)))
+        self.assertIn('Accept-Encoding', response['Vary'])
+
+    def test_vary_without_compression(self):
+        response = self.process(HttpResponse(self.body, content_type='application/json'), accept='gzip;q=0')
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertIn('Accept-Encoding', response['Vary'])
+
+    def test_skips_small_html_encoded_and_sse(self):
+        cases = {
+            'small': HttpResponse(b'{}', content_type='application/json'),
+            'html': HttpResponse(self.body, content_type='text/html'),
+            'sse': StreamingHttpResponse(iter([self.body]), content_type='text/event-stream'),
+        }
+        encoded = HttpResponse(self.body, content_type='application/json')
+        encoded['Content-Encoding'] = 'br'
+        cases['encoded'] = encoded
+        for name, response in cases.items():
+            with self.subTest(name):
+                result = self.process(response)
+                self.assertEqual(result.get('Content-Encoding'), 'br' if name == 'encoded' else None)
+                if not result.streaming:
+                    self.assertEqual(len(result.content), len(response.content))
+        response = self.process(HttpResponse(b'{"a": 1}' * 20, content_type='application/json'),
+                                COMPRESSION_MIN_SIZE=10, COMPRESSION_ENCODINGS=['gzip'])
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+
+    def test_streaming_json(self):
+        chunks = [self.body[i:i + 100] for i in range(0, len(self.body), 100)]
+        response = self.process(StreamingHttpResponse(iter(chunks), content_type='application/x-ndjson'),
+                                COMPRESSION_ENCODINGS=['gzip'])
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(b''.join(response.streaming_content)), self.body)
+
+    def test_no_compression_view(self):
+        response = self.client.get('/api/events', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertIs(response.wsgi_request.compress, False)
+        response.close()
@@ -0,0 +1,152 @@
+import json
+import re
+import threading
+import time
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.http.request import RawPostDataException
+
+DATE_RE = re.compile(r'^\d{4}-\d{2}-\d{2}$')
+DATETIME_RE = re.compile(r'^\d{4}-\d{2}-\d{2}[T ]\d{2}:\d{2}')
+INT_RE = re.compile(r'^-?\d+$')
+FLOAT_RE = re.compile(r'^-?\d+\.\d*$')
+
+REDACTED = '***'
+
+
+def value_shape(value):
+    """只记录请求体的结构和类型，不记录具体值"""
+    if isinstance(value, dict):
+        return {k: value_shape(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [value_shape(value[0])] if value else []
+    if value is None:
+        return 'null'
+    if isinstance(value, bool):
+        return 'bool'
+    if isinstance(value, int):
+        return 'int'
+    if isinstance(value, float):
+        return 'float'
+    return str_shape(str(value))
+
+
+def str_shape(value):
+    if DATE_RE.match(value):
+        return 'date'
+    if DATETIME_RE.match(value):
+        return 'datetime'
+    return 'str'
+
+
+def form_value_shape(value):
+    # 表单里所有值都是字符串，按内容猜测类型以便回放时生成能通过校验的值
+    if INT_RE.match(value):
+        return 'int'
+    if FLOAT_RE.match(value):
+        return 'float'
+    return str_shape(value)
+
+
+def sample_value(shape):
+    """根据记录的结构生成回放用的占位值"""
+    if isinstance(shape, dict):
+        return {k: sample_value(v) for k, v in shape.items()}
+    if isinstance(shape, list):
+        return [sample_value(s) for s in shape]
+    return {
+        'null': None,
+        'bool': True,
+        'int': 1,
+        'float': 1.0,
+        'date': '2000-01-01',
+        'datetime': '2000-01-01T00:00:00',
+    }.get(shape, 'x')
+
+
+def request_body_shape(request):
+    content_type = request.content_type or ''
+    if content_type.startswith('multipart/form-data') or content_type == 'application/x-www-form-urlencoded':
+        return {
+            'form': {k: form_value_shape(v) for k, v in request.POST.items()},
+            'files': {k: [f.size for f in request.FILES.getlist(k)] for k in request.FILES},
+        }
+    try:
+        body = request.body
+    except RawPostDataException:
+        return None
+    if not body:
+        return None
+    if content_type == 'application/json':
+        try:
+            return {'json': value_shape(json.loads(body))}
+        except ValueError:
+            pass
+    return {'raw': len(body)}
+
+
+class TrafficWriter:
+    def __init__(self, path):
+        self._lock = threading.Lock()
+        self._file = open(path, 'a', buffering=1, encoding='utf-8')
+
+    def write(self, line):
+        with self._lock:
+            self._file.write(line + '\n')
+
+
+_writers = {}
+_writers_lock = threading.Lock()
+
+
+def get_writer(path):
+    """同一个文件只打开一次：完整和精简中间件链里各有一个 TrafficRecorderMiddleware 实例，共用这个 writer"""
+    path = str(path)
+    with _writers_lock:
+        if path not in _writers:
+            _writers[path] = TrafficWriter(path)
+        return _writers[path]
+
+
+class TrafficRecorderMiddleware:
+    """把 API 请求按 JSONL 格式记录下来，供 replay_traffic 命令回放"""
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'TRAFFIC_RECORD', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.prefix = getattr(settings, 'TRAFFIC_RECORD_PREFIX', '/api/')
+        self.redact = set(getattr(settings, 'TRAFFIC_REDACT_PARAMS', ()))
+        self.writer = get_writer(settings.TRAFFIC_LOG_PATH)
+
+    def __call__(self, request):
+        if not request.path.startswith(self.prefix):
+            return self.get_response(request)
+
+        started = time.time()
+        t0 = time.perf_counter()
+        response = self.get_response(request)
+        duration = time.perf_counter() - t0
+
+        # 在视图之后读取请求体：此时 ninja 已经解析过，不会多读一次流
+        record = {
+            'ts': started,
+            'method': request.method,
+            'path': request.path,
+            'query': self.query(request),
+            'content_type': request.content_type,
+            'body': request_body_shape(request),
+            'status': response.status_code,
+            'duration_ms': round(duration * 1000, 3),
+        }
+        self.writer.write(json.dumps(record, ensure_ascii=False))
+        return response
+
+    def query(self, request):
+        if not self.redact:
+            return request.META.get('QUERY_STRING', '')
+        query = request.GET.copy()
+        for key in self.redact & set(query):
+            query.setlist(key, [REDACTED] * len(query.getlist(key)))
+        return query.urlencode()
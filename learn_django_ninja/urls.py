@@ -14,11 +14,21 @@ Including another URLconf
     1. Import the include() function: from django.urls import include, path
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
+from django.conf import settings
 from django.contrib import admin
 from django.urls import path
 from .api import api
+from .openapi import PrecomputedOpenAPIView
 
 urlpatterns = [
     path('admin/', admin.site.urls),
-    path('api/', api.urls),
 ]
+
+if settings.OPENAPI_PRECOMPUTED:
+    # 放在 api.urls 前面，接管同一路径的 openapi.json，文档页面仍然由 ninja 渲染
+    view = PrecomputedOpenAPIView(api, settings.OPENAPI_SCHEMA_PATH)
+    if api.docs_decorator:
+        view = api.docs_decorator(view)
+    urlpatterns.append(path('api' + api.openapi_url, view))
+
+urlpatterns.append(path('api/', api.urls))
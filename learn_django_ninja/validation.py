@@ -0,0 +1,357 @@
+import copy
+import datetime
+import decimal
+import logging
+import re
+from typing import Any, List, Optional
+
+from ninja.errors import ValidationError
+import pydantic
+from pydantic import BaseModel
+from pydantic.error_wrappers import error_dict
+from pydantic.fields import SHAPE_GENERIC, SHAPE_LIST, SHAPE_SINGLETON
+from pydantic.utils import lenient_issubclass
+
+try:
+    import msgspec
+except ImportError:  # 可选依赖，只有显式选择 msgspec 引擎时才需要
+    msgspec = None
+
+logger = logging.getLogger(__name__)
+
+# 只接管请求体；path / query / header / file 仍然走 ninja 原来的 pydantic 校验
+FAST_SOURCES = ('body', 'form')
+
+IMMUTABLE_DEFAULTS = (type(None), str, int, float, bool, bytes, tuple, frozenset, datetime.date, decimal.Decimal)
+
+MSGSPEC_TYPES = (str, int, float, bool, datetime.date, datetime.datetime, decimal.Decimal)
+
+PATH_RE = re.compile(r'at `\$((?:\.[^.`\[]+|\[\d+\])*)`')
+
+MISSING_RE = re.compile(r'^Object missing required field `([^`]+)`')
+
+
+class Unsupported(Exception):
+    """schema 里有引擎处理不了的写法，这个参数模型退回 pydantic"""
+
+
+class FieldErrors(Exception):
+    def __init__(self, errors):
+        super().__init__(errors)
+        self.errors = errors
+
+
+def has_class_validators(model):
+    if getattr(model, '__pre_root_validators__', None) or getattr(model, '__post_root_validators__', None):
+        return True
+    return any(field.pre_validators or field.post_validators for field in model.__fields__.values())
+
+
+def is_model_field(field):
+    return lenient_issubclass(field.type_, BaseModel)
+
+
+def constructor(model):
+    """
+    预先算好默认值的 construct()：BaseModel.construct 每次都要遍历字段、deepcopy 默认值，
+    在校验本身已经很快之后反而成了大头。可变默认值仍然每次复制。
+    """
+    fields = []
+    for name, field in model.__fields__.items():
+        if field.required:
+            fields.append((name, None, False))
+        elif field.default_factory is not None:
+            fields.append((name, field.default_factory, True))
+        elif isinstance(field.default, IMMUTABLE_DEFAULTS):
+            fields.append((name, field.default, False))
+        else:
+            fields.append((name, lambda default=field.default: copy.deepcopy(default), True))
+    set_attr = object.__setattr__
+    private = bool(model.__private_attributes__)
+
+    def construct(values):
+        # 按字段声明顺序重建字典，保证 .dict() / 响应 JSON 的键顺序与 pydantic 一致
+        data = {}
+        for name, default, call in fields:
+            if name in values:
+                data[name] = values[name]
+            else:
+                data[name] = default() if call else default
+        instance = model.__new__(model)
+        set_attr(instance, '__dict__', data)
+        set_attr(instance, '__fields_set__', set(values))
+        if private:
+            instance._init_private_attributes()
+        return instance
+
+    return construct
+
+
+def error(loc, exc, config):
+    # 与 pydantic 的 ErrorWrapper 一样：按 config 的模板生成 msg，并带上 ctx（如 limit_value）
+    return error_dict(exc, config, loc)
+
+
+class CompiledValidator:
+    """
+    按 schema 预先生成的校验函数：每个字段直接调用 pydantic 为它准备好的类型校验器，
+    跳过 BaseModel.__init__ 的通用逻辑，最后用 construct() 创建实例。
+    EmptyStrToDefault 这类自定义类型的校验器原样调用，语义与 pydantic 一致。
+    """
+
+    name = 'compiled'
+
+    def __init__(self, model):
+        if has_class_validators(model):
+            raise Unsupported(f'{model.__name__} has class validators')
+        self.model = model
+        self.construct = constructor(model)
+        self.fields = [(name, field.alias, self._compile(field), field) for name, field in model.__fields__.items()]
+
+    def _compile(self, field):
+        if field.shape == SHAPE_LIST and field.sub_fields:
+            item = self._compile(field.sub_fields[0])
+
+            def convert_list(value, loc):
+                if not isinstance(value, (list, tuple)):
+                    raise FieldErrors([{'loc': loc, 'msg': 'value is not a valid list', 'type': 'type_error.list'}])
+                return [item(v, loc + (i,)) for i, v in enumerate(value)]
+
+            return self._nullable(field, convert_list)
+        if field.shape not in (SHAPE_SINGLETON, SHAPE_GENERIC):
+            raise Unsupported(f'{field.name}: unsupported shape')
+
+        if is_model_field(field):
+            nested = compiled_validator(field.type_)
+            return self._nullable(field, nested.validate)
+
+        validators = field.validators
+        model_config = field.model_config
+
+        def convert(value, loc):
+            try:
+                for validator in validators:
+                    value = validator(None, value, {}, field, model_config)
+            except (ValueError, TypeError, AssertionError) as e:
+                raise FieldErrors([error(loc, e, model_config)])
+            return value
+
+        return self._nullable(field, convert)
+
+    @staticmethod
+    def _nullable(field, convert):
+        if field.allow_none:
+            return lambda value, loc: None if value is None else convert(value, loc)
+
+        def not_none(value, loc):
+            if value is None:
+                raise FieldErrors([{
+                    'loc': loc, 'msg': 'none is not an allowed value', 'type': 'type_error.none.not_allowed'}])
+            return convert(value, loc)
+
+        return not_none
+
+    def validate(self, data, loc=()):
+        if isinstance(data, self.model):
+            return data
+        if not isinstance(data, dict):
+            raise FieldErrors([{'loc': loc, 'msg': 'value is not a valid dict', 'type': 'type_error.dict'}])
+        values, errors = {}, []
+        for name, alias, convert, field in self.fields:
+            if alias not in data:
+                if field.required:
+                    errors.append({'loc': loc + (alias,), 'msg': 'field required', 'type': 'value_error.missing'})
+                continue
+            try:
+                values[name] = convert(data[alias], loc + (alias,))
+            except FieldErrors as e:
+                errors.extend(e.errors)
+        if errors:
+            raise FieldErrors(errors)
+        return self.construct(values)
+
+
+class MsgspecValidator:
+    """用 msgspec 按 schema 生成的 Struct 做类型转换，再 construct() 成原来的 schema 实例"""
+
+    name = 'msgspec'
+
+    def __init__(self, model):
+        if msgspec is None:
+            raise Unsupported('msgspec is not installed')
+        if has_class_validators(model):
+            raise Unsupported(f'{model.__name__} has class validators')
+        self.model = model
+        self.construct = constructor(model)
+        self.fields = []
+        struct_fields = []
+        for name, field in model.__fields__.items():
+            annotation, nested, validators = self._annotation(field)
+            default = msgspec.NODEFAULT if field.required else msgspec.UNSET
+            struct_fields.append((name, annotation, msgspec.field(name=field.alias, default=default)))
+            self.fields.append((name, nested, validators, field))
+        self.struct = msgspec.defstruct(f'{model.__name__}Struct', struct_fields, kw_only=True)
+
+    def _annotation(self, field):
+        nested = validators = None
+        if field.shape == SHAPE_GENERIC:
+            # EmptyStrToDefault[float] 这类自定义泛型，原样交给它自己的 pydantic 校验器
+            annotation, validators = Any, field.validators
+        elif is_model_field(field):
+            nested = msgspec_validator(field.type_)
+            annotation = nested.struct
+        elif field.type_ in MSGSPEC_TYPES:
+            annotation = field.type_
+        elif hasattr(field.type_, '__get_validators__'):
+            annotation, validators = Any, field.validators
+        else:
+            raise Unsupported(f'{field.name}: unsupported type {field.outer_type_!r}')
+
+        if field.shape == SHAPE_LIST:
+            annotation = List[annotation]
+        elif field.shape not in (SHAPE_SINGLETON, SHAPE_GENERIC):
+            raise Unsupported(f'{field.name}: unsupported shape')
+        if field.allow_none:
+            annotation = Optional[annotation]
+        return annotation, nested, validators
+
+    def _to_model(self, struct, loc):
+        values, errors = {}, []
+        for name, nested, validators, field in self.fields:
+            value = getattr(struct, name)
+            if value is msgspec.UNSET:
+                continue
+            if nested is not None and value is not None:
+                if field.shape == SHAPE_LIST:
+                    value = [nested._to_model(v, loc + (field.alias, i)) for i, v in enumerate(value)]
+                else:
+                    value = nested._to_model(value, loc + (field.alias,))
+            elif validators and value is not None:
+                try:
+                    for validator in validators:
+                        value = validator(None, value, {}, field, field.model_config)
+                except (ValueError, TypeError, AssertionError) as e:
+                    errors.append(error(loc + (field.alias,), e, field.model_config))
+                    continue
+            values[name] = value
+        if errors:
+            raise FieldErrors(errors)
+        return self.construct(values)
+
+    def validate(self, data, loc=()):
+        if isinstance(data, self.model):
+            return data
+        try:
+            struct = msgspec.convert(data, self.struct, strict=False)
+        except msgspec.ValidationError as e:
+            raise FieldErrors([self._error(str(e), loc)])
+        return self._to_model(struct, loc)
+
+    @staticmethod
+    def _error(message, loc):
+        """msgspec 只报告第一个错误，把消息里的 `$.item.price` 转换成 pydantic 风格的 loc"""
+        match = PATH_RE.search(message)
+        if match:
+            parts = re.findall(r'\.([^.\[]+)|\[(\d+)\]', match.group(1))
+            loc = loc + tuple(int(index) if index else key for key, index in parts)
+        missing = MISSING_RE.match(message)
+        if missing:
+            return {'loc': loc + (missing.group(1),), 'msg': 'field required', 'type': 'value_error.missing'}
+        return {'loc': loc, 'msg': message.split(' - at ')[0], 'type': 'value_error'}
+
+
+_compiled = {}
+_msgspec = {}
+
+
+def compiled_validator(model):
+    if model not in _compiled:
+        _compiled[model] = CompiledValidator(model)
+    return _compiled[model]
+
+
+def msgspec_validator(model):
+    if model not in _msgspec:
+        _msgspec[model] = MsgspecValidator(model)
+    return _msgspec[model]
+
+
+ENGINES = {
+    'compiled': compiled_validator,
+    'msgspec': msgspec_validator,
+}
+
+
+def get_validator(model, engine='compiled'):
+    return ENGINES[engine](model)
+
+
+def install(operation, engine='compiled'):
+    """把 operation 中 body / form 参数模型的校验换成快速引擎，其余参数模型保持不变"""
+    validators = {}
+    for model in operation.models:
+        if model._param_source not in FAST_SOURCES:
+            continue
+        try:
+            validators[model] = get_validator(model, engine)
+        except Unsupported as e:
+            logger.warning('fast validation disabled for %s (%s): %s', operation.view_func.__name__, model.__name__, e)
+    if not validators:
+        return
+
+    def _get_values(request, path_params, temporal_response):
+        # 与 Operation._get_values 相同，只是 body / form 参数模型换成快速引擎
+        values, errors = {}, []
+        for model in operation.models:
+            validator = validators.get(model)
+            try:
+                if validator is None:
+                    values.update(model.resolve(request, operation.api, path_params))
+                    continue
+                data = model.get_request_data(request, operation.api, path_params)
+                if data is None:
+                    values.update(model())
+                else:
+                    values.update(validator.validate(model._map_data_paths(data)))
+            except pydantic.ValidationError as e:
+                items = [dict(i) for i in e.errors()]
+            except FieldErrors as e:
+                items = e.errors
+            else:
+                continue
+            for item in items:
+                item['loc'] = (model._param_source,) + model._flatten_map_reverse.get(item['loc'], item['loc'])
+                errors.append(item)
+        if errors:
+            raise ValidationError(errors)
+        if operation.signature.response_arg:
+            values[operation.signature.response_arg] = temporal_response
+        return values
+
+    operation._get_values = _get_values
+
+
+def fast_validation(engine='compiled'):
+    """
+    让某个 operation 的请求体使用预编译校验器，用法：
+
+        @api.post('/items')
+        @fast_validation()
+        def create(request, item: Item): ...
+
+    compiled 与 pydantic 的结果和错误一致。msgspec 更快但语义不同（例如 str 字段收到数字会报错，
+    且只报告第一个错误），需要显式 @fast_validation('msgspec') 才会使用。
+    """
+
+    def decorator(view_func):
+        contribute = getattr(view_func, '_ninja_contribute_to_operation', None)
+
+        def contribute_to_operation(operation):
+            if contribute is not None:
+                contribute(operation)
+            install(operation, engine)
+
+        view_func._ninja_contribute_to_operation = contribute_to_operation
+        return view_func
+
+    return decorator